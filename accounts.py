@@ -0,0 +1,21 @@
+import hashlib
+
+from db import run_query
+
+
+# --- SECURITY UTILS ---
+def make_hashes(password):
+    return hashlib.sha256(str.encode(password)).hexdigest()
+
+def check_hashes(password, hashed_text):
+    if make_hashes(password) == hashed_text:
+        return True
+    return False
+
+# --- USERS ---
+def get_user_profile(username):
+    # Returns: username, role, employee_id, full_name, avatar_hash
+    data = run_query("SELECT username, role, employee_id, full_name, avatar_hash FROM users WHERE username = ?", (username,))
+    if data:
+        return data[0]
+    return None
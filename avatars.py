@@ -0,0 +1,68 @@
+import base64
+import hashlib
+import io
+
+import db
+import perf
+
+# Avatars are stored once per content hash as fixed-size thumbnails; users rows only carry the hash.
+THUMB_SIZES = {'sidebar': 128, 'profile': 256}
+THUMB_FORMAT = ("WEBP", "image/webp")
+
+
+# --- SCHEMA ---
+def init_avatars(c):
+    c.execute("CREATE TABLE IF NOT EXISTS avatar_blobs (hash TEXT, size INTEGER, mime TEXT, data BLOB, PRIMARY KEY (hash, size))")
+    columns = [r[1] for r in c.execute("PRAGMA table_info(users)")]
+    if 'avatar_hash' not in columns:
+        c.execute("ALTER TABLE users ADD COLUMN avatar_hash TEXT")
+    # Move any legacy base64 avatars out of the users row
+    for username, b64 in c.execute("SELECT username, avatar FROM users WHERE avatar IS NOT NULL AND avatar != ''").fetchall():
+        try:
+            digest = store_avatar(base64.b64decode(b64), c)
+        except Exception:
+            digest = None
+        c.execute("UPDATE users SET avatar_hash = ?, avatar = NULL WHERE username = ?", (digest, username))
+
+
+# --- STORE ---
+def make_thumbnail(raw, size):
+    from PIL import Image, ImageOps
+    img = ImageOps.exif_transpose(Image.open(io.BytesIO(raw)))
+    img = ImageOps.fit(img.convert("RGBA"), (size, size), Image.LANCZOS)
+    out = io.BytesIO()
+    img.save(out, THUMB_FORMAT[0], quality=85)
+    return out.getvalue()
+
+
+def store_avatar(raw, conn=None):
+    # Returns the content hash; identical uploads share one set of thumbnails
+    digest = hashlib.sha256(raw).hexdigest()
+    rows = [(digest, size, THUMB_FORMAT[1], make_thumbnail(raw, size)) for size in THUMB_SIZES.values()]
+    sql = "INSERT OR IGNORE INTO avatar_blobs (hash, size, mime, data) VALUES (?,?,?,?)"
+    if conn is not None:
+        conn.executemany(sql, rows)
+    else:
+        db.write_many(sql, rows)
+    return digest
+
+
+def set_user_avatar(username, uploaded_file):
+    from PIL import Image
+    try:
+        digest = store_avatar(uploaded_file.getvalue())
+    except (OSError, Image.DecompressionBombError) as e:
+        # Unidentified or truncated files are OSErrors; oversized ones trip Pillow's bomb guard
+        raise ValueError(f"{uploaded_file.name} is not a readable image") from e
+    db.write("UPDATE users SET avatar_hash = ? WHERE username = ?", (digest, username))
+    return digest
+
+
+# --- LOOKUP ---
+@perf.cache_data(show_spinner=False, max_entries=256)
+def avatar_data_uri(digest, slot):
+    # Content-addressed, so a cached entry can never go stale
+    row = db.read_one("SELECT mime, data FROM avatar_blobs WHERE hash = ? AND size = ?", (digest, THUMB_SIZES[slot]))
+    if row is None:
+        return None
+    return f"data:{row[0]};base64,{base64.b64encode(row[1]).decode('ascii')}"
@@ -0,0 +1,313 @@
+"""Headless benchmark for the inventory workloads.
+
+    python bench.py generate --scale medium --db /tmp/bench.db
+    python bench.py run --db /tmp/bench.db --out bench.json
+    python bench.py compare before.json after.json
+
+`run` generates the database first if it does not exist. Results are JSON, one entry per
+operation with p50/p95 latency and throughput, so runs can be diffed across commits.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import db
+import sync
+
+SCALES = {
+    'small': {'items': 500, 'kits': 20, 'fanout': 8, 'years': 1, 'moves_per_day': 50, 'users': 10},
+    'medium': {'items': 5000, 'kits': 100, 'fanout': 15, 'years': 3, 'moves_per_day': 400, 'users': 50},
+    'large': {'items': 20000, 'kits': 400, 'fanout': 25, 'years': 5, 'moves_per_day': 2000, 'users': 200},
+}
+CATEGORIES = ["Microcontrollers", "Sensors", "Motors", "Wires", "Power", "Tools", "Mechanical", "Displays"]
+INSERT_BATCH = 20_000
+
+
+# --- SYNTHETIC DATA ---
+def generate(db_file, items, kits, fanout, years, moves_per_day, users, seed=2025):
+    # Builds a fresh database through the real migrations, then bulk-loads it deterministically
+    if os.path.exists(db_file):
+        raise FileExistsError(db_file)
+    import migrations
+    from accounts import make_hashes
+    db.DB_FILE = db_file
+    migrations.migrate()
+    rng = random.Random(seed)
+
+    usernames = ["admin"] + [f"user{n:04d}" for n in range(1, users)]
+    item_rows = [(f"{rng.choice(CATEGORIES)[:4].upper()}-{n:06d}", rng.choice(CATEGORIES), 0, rng.randint(5, 50),
+                  f"{chr(65 + n % 26)}{n % 40}") for n in range(items)]
+    with db.transaction() as c:
+        c.executemany("INSERT OR IGNORE INTO users (username, password, role, full_name) VALUES (?,?,?,?)",
+                      [(u, make_hashes(u), "staff", u.title()) for u in usernames[1:]])
+        c.executemany("INSERT INTO items (name, category, quantity, threshold, location) VALUES (?,?,?,?,?)", item_rows)
+        c.executemany("INSERT INTO kits (name, description) VALUES (?,?)", [(f"Kit {n:04d}", "synthetic") for n in range(kits)])
+        c.executemany("INSERT INTO kit_contents (kit_id, item_id, qty_needed) VALUES (?,?,?)",
+                      [(k, i, rng.randint(1, 4)) for k in range(1, kits + 1) for i in rng.sample(range(1, items + 1), min(fanout, items))])
+
+    # Movements: a large opening receipt per item, then random traffic spread over `years`
+    start = datetime.now() - timedelta(days=365 * years)
+    ts0 = int(start.timestamp())
+    user_ids = dict(db.read("SELECT username, id FROM users"))
+    stock = [0] * (items + 1)
+    opening = []
+    for item_id in range(1, items + 1):
+        stock[item_id] = rng.randint(500, 5000)
+        opening.append((item_id, user_ids["admin"], "IN", stock[item_id], ts0, "Opening Stock"))
+    total = int(365 * years * moves_per_day)
+    span = max(1, int(datetime.now().timestamp()) - ts0)
+
+    def moves():
+        yield from opening
+        for n in range(total):
+            item_id = rng.randint(1, items)
+            qty = rng.randint(1, 10)
+            if rng.random() < 0.35 or stock[item_id] < qty:
+                kind, stock[item_id] = "IN", stock[item_id] + qty
+            else:
+                kind, stock[item_id] = "OUT", stock[item_id] - qty
+            yield (item_id, user_ids[rng.choice(usernames)], kind, qty, ts0 + n * span // total, "synthetic")
+
+    # The balance and rollup triggers are replaced by one pass each after the load; synthetic
+    # history is not written to the sync change log
+    with db.transaction() as c, sync.paused(c):
+        c.execute("DROP TRIGGER IF EXISTS ledger_balance")
+        c.execute("DROP TRIGGER IF EXISTS usage_rollup")
+        batch = []
+        for row in moves():
+            batch.append(row)
+            if len(batch) >= INSERT_BATCH:
+                c.executemany("INSERT INTO stock_moves (item_id, user_id, type, qty_change, ts, note) VALUES (?,?,?,?,?,?)", batch)
+                batch = []
+        if batch:
+            c.executemany("INSERT INTO stock_moves (item_id, user_id, type, qty_change, ts, note) VALUES (?,?,?,?,?,?)", batch)
+        c.execute("""WITH run AS (
+                SELECT id, SUM(CASE type WHEN 'OUT' THEN -qty_change ELSE qty_change END) OVER (PARTITION BY item_id ORDER BY id) AS total
+                FROM stock_moves
+            )
+            UPDATE stock_moves SET balance = run.total FROM run WHERE run.id = stock_moves.id""")
+        c.executemany("UPDATE items SET quantity = ? WHERE id = ?", [(stock[i], i) for i in range(1, items + 1)])
+        c.execute("INSERT OR IGNORE INTO stock_snapshots (item_id, txn_id, balance, ts) SELECT id, 0, 0, 0 FROM items")
+        import forecast
+        import ledger
+        c.execute(ledger.BALANCE_TRIGGER)
+        ledger.take_snapshots(c)
+        c.execute(forecast.ROLLUP_TRIGGER)
+        forecast.rebuild_rollups(c)
+        forecast.refresh_forecasts(c)
+    with db.connection() as c:
+        c.execute("ANALYZE")
+    return {'items': items, 'kits': kits, 'kit_contents': kits * min(fanout, items), 'moves': total + items}
+
+
+# --- TIMING ---
+def measure(fn, iterations, warmup=2):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t) * 1000)
+    return summarize(samples, time.perf_counter() - started)
+
+
+def summarize(samples, elapsed):
+    # samples in ms; elapsed is the wall time they were taken over, in seconds
+    samples = sorted(samples)
+    return {
+        'n': len(samples),
+        'p50_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'max_ms': round(samples[-1], 3),
+        'ops_per_s': round(len(samples) / elapsed, 2) if elapsed else None,
+    }
+
+
+def operations(rng, import_rows):
+    # Each entry times one of the app's real code paths, outside the Streamlit UI
+    import pandas as pd
+
+    import dashboard
+    import exporter
+    import forecast
+    import importer
+    import inventory
+    import reports
+
+    kits = db.read("SELECT id, name FROM kits")
+    item_ids = [r[0] for r in db.read("SELECT id FROM items")]
+    item_names = [r[0] for r in db.read("SELECT name FROM items")]
+    cached = (dashboard.dashboard_metrics, dashboard.category_distribution, dashboard.purchase_requisition, dashboard.reorder_history)
+
+    def dashboard_cold():
+        version = dashboard.data_version()
+        for fn in cached:
+            fn.clear()
+            fn(version)
+
+    def issue_kit():
+        kit_id, name = rng.choice(kits)
+        try:
+            inventory.issue_kit(kit_id, name, "admin")
+        except inventory.InsufficientStock:
+            pass
+
+    def restock():
+        inventory.adjust_stock(rng.choice(item_ids), rng.randint(1, 20), "admin", "bench")
+
+    def deduct():
+        try:
+            inventory.adjust_stock(rng.choice(item_ids), -rng.randint(1, 5), "admin", "bench")
+        except inventory.InsufficientStock:
+            pass
+
+    def bulk_import():
+        # Half existing names (updates), half new ones (inserts)
+        names = [f"BULK-{rng.randrange(10**9):09d}" if n % 2 else rng.choice(item_names) for n in range(import_rows)]
+        frame = pd.DataFrame({'Name': names, 'Category': "Bulk", 'Quantity': 5, 'Threshold': 1, 'Location': "BULK"})
+        importer.import_items([frame], user="admin")
+
+    def report_period(period="Monthly (Last 30 Days)"):
+        where, params = reports.build_filters(period)
+        reports.summarize(where, params)
+        reports.fetch_page(where, params, limit=100)
+
+    def report_user_out():
+        where, params = reports.build_filters("Yearly (Last 365 Days)", user="admin", txn_type="OUT")
+        reports.summarize(where, params)
+        reports.fetch_page(where, params, limit=100)
+
+    def export_csv():
+        where, params = reports.build_filters("Monthly (Last 30 Days)")
+        exporter.discard(exporter.export_transactions(where, params, 'csv', "admin", "bench"))
+
+    def refresh_forecasts():
+        with db.transaction() as c:
+            forecast.refresh_forecasts(c)
+
+    def trend_365d():
+        forecast.daily_trend.clear()
+        forecast.daily_trend(dashboard.data_version(), (datetime.now().date() - timedelta(days=365)).isoformat())
+
+    return {
+        'dashboard_cold': (dashboard_cold, 20),
+        'issue_kit': (issue_kit, 50),
+        'restock': (restock, 100),
+        'deduct': (deduct, 100),
+        'bulk_import': (bulk_import, 5),
+        'report_period_30d': (report_period, 30),
+        'report_period_all': (lambda: report_period("All Time"), 30),
+        'report_user_out_365d': (report_user_out, 30),
+        'export_csv_30d': (export_csv, 5),
+        'forecast_refresh': (refresh_forecasts, 5),
+        'trend_365d': (trend_365d, 20),
+    }
+
+
+def run(db_file, only=None, repeat=1.0, import_rows=1000, seed=7):
+    db.DB_FILE = db_file
+    rng = random.Random(seed)
+    results = {}
+    for name, (fn, iterations) in operations(rng, import_rows).items():
+        if only and name not in only:
+            continue
+        results[name] = measure(fn, max(1, int(iterations * repeat)))
+        print(f"{name:24s} p50 {results[name]['p50_ms']:9.2f} ms   p95 {results[name]['p95_ms']:9.2f} ms", file=sys.stderr)
+    return results
+
+
+def environment(db_file):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    db.DB_FILE = db_file
+    sizes = {t: db.read_value(f"SELECT count(*) FROM {t}", default=0) for t in ("items", "kits", "kit_contents", "stock_moves")}
+    return {
+        'commit': commit,
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'db_bytes': sum(os.path.getsize(db_file + ext) for ext in ("", "-wal") if os.path.exists(db_file + ext)),
+        'rows': sizes,
+    }
+
+
+def compare(before, after):
+    for name in sorted(set(before['results']) & set(after['results'])):
+        b, a = before['results'][name], after['results'][name]
+        change = (a['p50_ms'] - b['p50_ms']) / b['p50_ms'] * 100 if b['p50_ms'] else 0.0
+        print(f"{name:24s} p50 {b['p50_ms']:9.2f} -> {a['p50_ms']:9.2f} ms ({change:+.1f}%)   "
+              f"p95 {b['p95_ms']:9.2f} -> {a['p95_ms']:9.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RoboLab inventory benchmarks")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def scale_args(p):
+        p.add_argument("--scale", choices=SCALES, default="small")
+        for key in SCALES['small']:
+            p.add_argument(f"--{key.replace('_', '-')}", type=int, dest=key, help=f"override the scale's {key}")
+        p.add_argument("--seed", type=int, default=2025)
+
+    gen = sub.add_parser("generate", help="build a synthetic database")
+    gen.add_argument("--db", required=True)
+    scale_args(gen)
+
+    bench = sub.add_parser("run", help="time the app's operations against a database")
+    bench.add_argument("--db", required=True)
+    bench.add_argument("--out", help="write JSON results here (default: stdout)")
+    bench.add_argument("--only", nargs="*", help="operation names to run")
+    bench.add_argument("--repeat", type=float, default=1.0, help="scale every operation's iteration count")
+    bench.add_argument("--import-rows", type=int, default=1000)
+    scale_args(bench)
+
+    cmp = sub.add_parser("compare", help="diff two result files")
+    cmp.add_argument("before")
+    cmp.add_argument("after")
+
+    args = parser.parse_args(argv)
+    # The cached helpers log a warning per call when there is no Streamlit runtime
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    if args.command == "compare":
+        with open(args.before) as b, open(args.after) as a:
+            compare(json.load(b), json.load(a))
+        return
+
+    scale = dict(SCALES[args.scale])
+    scale.update({k: getattr(args, k) for k in scale if getattr(args, k) is not None})
+    if args.command == "generate" or not os.path.exists(args.db):
+        started = time.perf_counter()
+        counts = generate(args.db, seed=args.seed, **scale)
+        print(f"generated {counts} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        if args.command == "generate":
+            return
+
+    report = {'scale': {'name': args.scale, **scale}, 'environment': environment(args.db),
+              'results': run(args.db, args.only, args.repeat, args.import_rows)}
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import db
+import perf
+
+# Kits hold items (kit_contents) and other kits (kit_children). Everything that issues or
+# plans a kit works on the flattened bill of materials, which one recursive CTE computes for
+# every kit at once; it is cached on kit_version, which only kit definition changes bump, so
+# stock movements never invalidate it and a nested kit costs the same dict lookup as a flat one.
+MAX_DEPTH = 16
+
+EXPLODE_SQL = f"""WITH RECURSIVE tree(root, kit_id, mult, depth) AS (
+        SELECT id, id, 1, 0 FROM kits
+        UNION ALL
+        SELECT t.root, c.child_kit_id, t.mult * c.qty_needed, t.depth + 1
+        FROM tree t JOIN kit_children c ON c.kit_id = t.kit_id WHERE t.depth < {MAX_DEPTH}
+    )
+    SELECT t.root, kc.item_id, SUM(t.mult * kc.qty_needed) FROM tree t JOIN kit_contents kc ON kc.kit_id = t.kit_id
+    WHERE kc.item_id IS NOT NULL GROUP BY t.root, kc.item_id"""
+
+DESCENDANTS_SQL = f"""WITH RECURSIVE tree(kit_id, depth) AS (
+        SELECT ?, 0
+        UNION SELECT c.child_kit_id, t.depth + 1 FROM kit_children c JOIN tree t ON c.kit_id = t.kit_id WHERE t.depth < {MAX_DEPTH}
+    )
+    SELECT 1 FROM tree WHERE kit_id = ? LIMIT 1"""
+
+DEFINITION_TABLES = ("kits", "kit_contents", "kit_children")
+
+
+class KitCycle(ValueError):
+    pass
+
+
+# --- SCHEMA ---
+def init_bom(c):
+    # Folds duplicate (kit, item) lines into one before the unique key goes on
+    c.execute("""UPDATE kit_contents SET qty_needed = (
+            SELECT SUM(d.qty_needed) FROM kit_contents d WHERE d.kit_id = kit_contents.kit_id AND d.item_id = kit_contents.item_id)
+        WHERE id IN (SELECT MIN(id) FROM kit_contents GROUP BY kit_id, item_id HAVING COUNT(*) > 1)""")
+    c.execute("DELETE FROM kit_contents WHERE kit_id IS NOT NULL AND item_id IS NOT NULL AND id NOT IN (SELECT MIN(id) FROM kit_contents GROUP BY kit_id, item_id)")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_kit_contents_line ON kit_contents(kit_id, item_id)")
+    c.execute('''CREATE TABLE IF NOT EXISTS kit_children (
+        kit_id INTEGER NOT NULL REFERENCES kits(id),
+        child_kit_id INTEGER NOT NULL REFERENCES kits(id),
+        qty_needed INTEGER NOT NULL CHECK (qty_needed > 0),
+        PRIMARY KEY (kit_id, child_kit_id),
+        CHECK (kit_id != child_kit_id)
+    ) WITHOUT ROWID''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_kit_children_child ON kit_children(child_kit_id)")
+    c.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('kit_version', 0)")
+    for table in DEFINITION_TABLES:
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            c.execute(f"CREATE TRIGGER IF NOT EXISTS bump_kit_version_{table}_{event.lower()} AFTER {event} ON {table} "
+                      "BEGIN UPDATE meta SET value = value + 1 WHERE key = 'kit_version'; END")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS bump_version_kit_children_{event.lower()} AFTER {event} ON kit_children "
+                  "BEGIN UPDATE meta SET value = value + 1 WHERE key = 'data_version'; END")
+
+
+# --- EXPLOSION ---
+def kit_version(conn=None):
+    sql = "SELECT value FROM meta WHERE key = 'kit_version'"
+    if conn is not None:
+        return conn.execute(sql).fetchone()[0]
+    return db.read_value(sql, default=0)
+
+
+@perf.cache_data(show_spinner=False, max_entries=2)
+def explosion(version):
+    # {kit_id: {item_id: qty per kit}} for every kit, sub-kits multiplied out
+    flat = {}
+    for root, item_id, qty in db.read(EXPLODE_SQL):
+        flat.setdefault(root, {})[item_id] = qty
+    return flat
+
+
+def explode(kit_id, conn=None):
+    return explosion(kit_version(conn)).get(kit_id, {})
+
+
+# --- DEFINITIONS ---
+def would_cycle(conn, kit_id, child_kit_id):
+    # True if kit_id is child_kit_id itself or already inside it
+    return kit_id == child_kit_id or conn.execute(DESCENDANTS_SQL, (child_kit_id, kit_id)).fetchone() is not None
+
+
+def link_item(kit_id, item_id, qty):
+    # Linking an item a kit already holds adds to its line instead of duplicating it
+    with db.transaction() as conn:
+        conn.execute("""INSERT INTO kit_contents (kit_id, item_id, qty_needed) VALUES (?,?,?)
+            ON CONFLICT (kit_id, item_id) DO UPDATE SET qty_needed = qty_needed + excluded.qty_needed""", (kit_id, item_id, qty))
+
+
+def link_kit(kit_id, child_kit_id, qty):
+    with db.transaction() as conn:
+        if would_cycle(conn, kit_id, child_kit_id):
+            raise KitCycle("A kit cannot contain itself, directly or through its sub-kits")
+        conn.execute("""INSERT INTO kit_children (kit_id, child_kit_id, qty_needed) VALUES (?,?,?)
+            ON CONFLICT (kit_id, child_kit_id) DO UPDATE SET qty_needed = qty_needed + excluded.qty_needed""", (kit_id, child_kit_id, qty))
+
+
+def definition(kit_id):
+    # Direct contents, for editing: [(type, name, qty), ...]
+    return db.read("""SELECT 'Item', i.name, kc.qty_needed FROM kit_contents kc JOIN items i ON i.id = kc.item_id WHERE kc.kit_id = ?
+        UNION ALL
+        SELECT 'Sub-kit', k.name, c.qty_needed FROM kit_children c JOIN kits k ON k.id = c.child_kit_id WHERE c.kit_id = ?""", (kit_id, kit_id))
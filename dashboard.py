@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import db
+import exporter
+import ledger
+import perf
+
+# Every cached entry is keyed on the data version that the inventory triggers bump,
+# so reruns are served from memory until a write actually lands.
+VERSIONED_TABLES = ("items", "kits", "kit_contents")
+
+
+def data_version():
+    return db.read_value("SELECT value FROM meta WHERE key = 'data_version'", default=0)
+
+
+@perf.cache_data(show_spinner=False, max_entries=8)
+def dashboard_metrics(version):
+    n_items, volume = db.read_one("SELECT count(*), COALESCE(SUM(quantity), 0) FROM items")
+    n_kits = db.read_value("SELECT count(*) FROM kits", default=0)
+    return {'items': n_items, 'volume': volume, 'kits': n_kits}
+
+
+@perf.cache_data(show_spinner=False, max_entries=8)
+def category_distribution(version):
+    return db.read_df("SELECT category, SUM(quantity) AS qty FROM items GROUP BY category").set_index('category')['qty']
+
+
+@perf.cache_data(show_spinner=False, max_entries=8)
+def purchase_requisition(version):
+    return db.read_df(exporter.PO_SQL, columns=exporter.PO_COLUMNS)
+
+
+@perf.cache_data(show_spinner=False, max_entries=8)
+def reorder_history(version, limit=100):
+    return db.read_df(
+        "SELECT i.name, h.event, h.quantity, h.threshold, h.date FROM reorder_history h JOIN items i ON i.id = h.item_id ORDER BY h.id DESC LIMIT ?",
+        (limit,), columns=['Item Name', 'Event', 'Qty', 'Min Limit', 'Date'],
+    )
+
+
+@perf.cache_data(show_spinner=False, max_entries=8)
+def stock_levels_on(version, day):
+    # End-of-day stock of every item, rebuilt from snapshots and the ledger tail
+    return ledger.stock_levels_at(datetime.combine(day, datetime.max.time()))
@@ -0,0 +1,196 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import streamlit as st
+
+import perf
+
+DB_FILE = os.environ.get("ROBOLAB_DB", "robolab_kits.db")
+
+# --- TUNING ---
+POOL_SIZE = 8             # idle connections kept per process
+BUSY_TIMEOUT_MS = 5000    # how long a writer waits on the lock before "database is locked"
+STATEMENT_CACHE = 256     # prepared statements kept per connection
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA foreign_keys=ON",
+)
+
+
+def _connect(db_file):
+    # isolation_level=None: we issue BEGIN ourselves so writes take the lock up front
+    conn = sqlite3.connect(
+        db_file,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE,
+    )
+    if not conn.execute("PRAGMA page_count").fetchone()[0]:
+        # New, empty file: let maintenance.compact free pages incrementally. Must precede WAL, and
+        # is not sent to existing files, where it waits on the write lock.
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+# --- CONNECTION POOL ---
+class ConnectionPool:
+    def __init__(self, db_file, size=POOL_SIZE):
+        self.db_file = db_file
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            # Never block: overflow connections are opened on demand and dropped on release
+            return _connect(self.db_file)
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if not self._closed:
+                try:
+                    self._idle.put_nowait(conn)
+                    return
+                except queue.Full:
+                    pass
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+@st.cache_resource(show_spinner=False)
+def get_pool(db_file):
+    return ConnectionPool(db_file)
+
+
+def pool():
+    return get_pool(DB_FILE)
+
+
+@contextmanager
+def connection():
+    with pool().connection() as conn:
+        yield conn
+
+
+@contextmanager
+def transaction(conn=None):
+    # BEGIN IMMEDIATE takes the write lock at the start, so concurrent writers queue on
+    # busy_timeout instead of failing half-way through with SQLITE_BUSY.
+    # Pass conn to run on a connection already held (e.g. one with TEMP tables staged).
+    if conn is not None:
+        with _begin(conn) as conn:
+            yield conn
+        return
+    with pool().connection() as conn, _begin(conn) as conn:
+        yield conn
+
+
+@contextmanager
+def _begin(conn):
+    with perf.timed('txn', "transaction") as info:
+        start = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        info['wait_ms'] = (time.perf_counter() - start) * 1000
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+
+# --- TYPED READS ---
+def read(query, params=()):
+    with connection() as conn, perf.timed('query', perf.query_name(query)) as info:
+        rows = conn.execute(query, params).fetchall()
+        info['rows'] = len(rows)
+        return rows
+
+
+def read_one(query, params=()):
+    with connection() as conn, perf.timed('query', perf.query_name(query)) as info:
+        row = conn.execute(query, params).fetchone()
+        info['rows'] = int(row is not None)
+        return row
+
+
+def read_value(query, params=(), default=None):
+    row = read_one(query, params)
+    return row[0] if row is not None and row[0] is not None else default
+
+
+def read_df(query, params=(), columns=None):
+    import pandas as pd
+    with connection() as conn, perf.timed('query', perf.query_name(query)) as info:
+        cur = conn.execute(query, params)
+        rows = cur.fetchall()
+        info['rows'] = len(rows)
+        if columns is None:
+            columns = [d[0] for d in cur.description]
+    with perf.timed('frame', perf.query_name(query)):
+        return pd.DataFrame(rows, columns=columns)
+
+
+# --- WRITES ---
+def write(query, params=()):
+    try:
+        with transaction() as conn, perf.timed('query', perf.query_name(query)) as info:
+            info['rows'] = conn.execute(query, params).rowcount
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def write_many(query, seq_of_params):
+    try:
+        with transaction() as conn, perf.timed('query', perf.query_name(query)) as info:
+            info['rows'] = conn.executemany(query, seq_of_params).rowcount
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def run_query(query, params=()):
+    # Legacy entry point: SELECTs return rows, everything else returns True/False
+    try:
+        if query.lower().strip().startswith("select"):
+            return read(query, params)
+        with transaction() as conn, perf.timed('query', perf.query_name(query)) as info:
+            info['rows'] = conn.execute(query, params).rowcount
+        return True
+    except sqlite3.Error:
+        return False
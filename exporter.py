@@ -0,0 +1,117 @@
+import csv
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import db
+import perf
+import reports
+
+CHUNK_ROWS = 5000
+MIME_TYPES = {
+    'csv': "text/csv",
+    'xlsx': "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+# --- WRITERS ---
+def _write_csv(cur, columns, path, progress=None):
+    rows = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        while True:
+            chunk = cur.fetchmany(CHUNK_ROWS)
+            if not chunk:
+                break
+            writer.writerows(chunk)
+            rows += len(chunk)
+            if progress:
+                progress(rows)
+    return rows
+
+
+def _write_xlsx(cur, columns, path, progress=None):
+    from openpyxl import Workbook
+    # write_only streams rows to disk instead of building the whole sheet in memory
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Report")
+    ws.append(columns)
+    rows = 0
+    while True:
+        chunk = cur.fetchmany(CHUNK_ROWS)
+        if not chunk:
+            break
+        for row in chunk:
+            ws.append(row)
+        rows += len(chunk)
+        if progress:
+            progress(rows)
+    wb.save(path)
+    return rows
+
+
+WRITERS = {'csv': _write_csv, 'xlsx': _write_xlsx}
+
+
+# --- EXPORT ---
+def export_query(sql, params, columns, fmt='csv', user=None, label="", progress=None, total=None):
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    start = time.perf_counter()
+    fd, path = tempfile.mkstemp(prefix="robolab_export_", suffix=f".{fmt}")
+    os.close(fd)
+    try:
+        with db.connection() as conn:
+            report = (lambda n: progress(n, total, f"{n} rows written")) if progress else None
+            rows = WRITERS[fmt](conn.execute(sql, params), columns, path, report)
+    except BaseException:
+        os.remove(path)
+        raise
+    size = os.path.getsize(path)
+    perf.record('export', f"{label or 'export'} ({fmt})", (time.perf_counter() - start) * 1000, rows)
+    db.write("INSERT INTO exports (user, label, format, rows, bytes, seconds, date) VALUES (?,?,?,?,?,?,?)",
+             (user, label, fmt, rows, size, round(time.perf_counter() - start, 3), datetime.now()))
+    return {'path': path, 'rows': rows, 'bytes': size, 'format': fmt, 'mime': MIME_TYPES[fmt]}
+
+
+# Items at or below their threshold (reorder_queue) or their demand-based reorder point
+# (item_forecast), so the cost follows the number of due items, not the catalogue. To Buy
+# tops stock up to the forecast order-up-to level, never less than the old threshold + 5.
+# CROSS JOIN pins the join order so items is only ever probed by primary key.
+PO_SQL = """WITH due AS (
+        SELECT item_id FROM reorder_queue
+        UNION SELECT f.item_id FROM item_forecast f CROSS JOIN items i ON i.id = f.item_id WHERE i.quantity <= f.reorder_point
+    )
+    SELECT i.name, i.category, i.quantity, i.threshold, f.reorder_point, f.daily_rate,
+           MAX((i.threshold - i.quantity) + 5, COALESCE(f.order_up_to - i.quantity, 0)), i.location
+    FROM due CROSS JOIN items i ON i.id = due.item_id LEFT JOIN item_forecast f ON f.item_id = i.id
+    WHERE i.threshold >= 0 ORDER BY i.name"""
+PO_COLUMNS = ['Item Name', 'Category', 'Current Qty', 'Min Limit', 'Reorder Point', 'Daily Use', 'To Buy', 'Location']
+
+
+def export_purchase_order(fmt='csv', user=None):
+    return export_query(PO_SQL, (), PO_COLUMNS, fmt, user, "Purchase Order")
+
+
+def export_transactions(where, params, fmt='csv', user=None, label="", progress=None, total=None):
+    sql = reports.REPORT_SELECT + where + " ORDER BY m.ts DESC, m.id DESC"
+    return export_query(sql, params, reports.REPORT_COLUMNS, fmt, user, label, progress, total)
+
+
+def discard(export):
+    if export and os.path.exists(export['path']):
+        os.remove(export['path'])
+
+
+def deferred(export_fn, *args, **kwargs):
+    # For st.download_button(data=callable): the export only runs when the button is clicked
+    def produce():
+        export = export_fn(*args, **kwargs)
+        try:
+            with open(export['path'], 'rb') as f:
+                return f.read()
+        finally:
+            discard(export)
+    return produce
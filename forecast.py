@@ -0,0 +1,125 @@
+import math
+from datetime import date, timedelta
+
+import numpy as np
+
+import db
+import perf
+
+# daily_usage holds one row per item per local day with the IN and OUT volume, and
+# daily_totals the same summed over all items; a trigger on stock_moves keeps both current,
+# so trends and forecasts never scan the ledger. Forecasts are recomputed once a day from
+# complete days only and stored in item_forecast, where the purchase requisition query can
+# join them. Loan moves (stock_moves.loan_id set) are lending and returns, not usage, and are
+# left out of the rollups.
+HISTORY_DAYS = 90
+MA_WINDOW = 28
+ALPHA = 0.1                # exponential smoothing of daily OUT; ~2/ALPHA days of memory
+LEAD_TIME_DAYS = 14        # order to arrival
+COVER_DAYS = 30            # how long an order should last once it arrives
+SERVICE_Z = 1.65           # ~95% of lead-time demand covered by safety stock
+
+ROLLUP_TRIGGER = """CREATE TRIGGER IF NOT EXISTS usage_rollup AFTER INSERT ON stock_moves WHEN NEW.loan_id IS NULL BEGIN
+    INSERT INTO daily_usage (item_id, day, qty_in, qty_out, moves)
+    VALUES (NEW.item_id, date(NEW.ts, 'unixepoch', 'localtime'),
+            CASE NEW.type WHEN 'IN' THEN NEW.qty_change ELSE 0 END, CASE NEW.type WHEN 'OUT' THEN NEW.qty_change ELSE 0 END, 1)
+    ON CONFLICT (item_id, day) DO UPDATE SET qty_in = qty_in + excluded.qty_in, qty_out = qty_out + excluded.qty_out, moves = moves + 1;
+    INSERT INTO daily_totals (day, qty_in, qty_out, moves)
+    VALUES (date(NEW.ts, 'unixepoch', 'localtime'), CASE NEW.type WHEN 'IN' THEN NEW.qty_change ELSE 0 END, CASE NEW.type WHEN 'OUT' THEN NEW.qty_change ELSE 0 END, 1)
+    ON CONFLICT (day) DO UPDATE SET qty_in = qty_in + excluded.qty_in, qty_out = qty_out + excluded.qty_out, moves = moves + 1;
+END"""
+
+
+# --- ROLLUPS ---
+def init_rollups(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS daily_usage (item_id INTEGER NOT NULL REFERENCES items(id), day TEXT NOT NULL,
+        qty_in INTEGER NOT NULL DEFAULT 0, qty_out INTEGER NOT NULL DEFAULT 0, moves INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (item_id, day)) WITHOUT ROWID''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_daily_usage_day ON daily_usage(day, item_id, qty_out)")
+    c.execute('''CREATE TABLE IF NOT EXISTS daily_totals (day TEXT PRIMARY KEY, qty_in INTEGER NOT NULL DEFAULT 0,
+        qty_out INTEGER NOT NULL DEFAULT 0, moves INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID''')
+    c.execute('''CREATE TABLE IF NOT EXISTS item_forecast (item_id INTEGER PRIMARY KEY REFERENCES items(id), daily_avg REAL,
+        daily_rate REAL, daily_sd REAL, reorder_point INTEGER, order_up_to INTEGER, day TEXT)''')
+    c.execute(ROLLUP_TRIGGER)
+    rebuild_rollups(c)
+    maybe_refresh_forecasts(c)
+
+
+def rebuild_rollups(c):
+    # Full recount from the ledger; for the initial backfill and after bulk loads that bypass the trigger
+    c.execute("DELETE FROM daily_usage")
+    c.execute("""INSERT INTO daily_usage (item_id, day, qty_in, qty_out, moves)
+        SELECT item_id, date(ts, 'unixepoch', 'localtime'), SUM(CASE type WHEN 'IN' THEN qty_change ELSE 0 END),
+               SUM(CASE type WHEN 'OUT' THEN qty_change ELSE 0 END), COUNT(*)
+        FROM stock_moves WHERE loan_id IS NULL GROUP BY item_id, date(ts, 'unixepoch', 'localtime')""")
+    c.execute("DELETE FROM daily_totals")
+    c.execute("INSERT INTO daily_totals (day, qty_in, qty_out, moves) SELECT day, SUM(qty_in), SUM(qty_out), SUM(moves) FROM daily_usage GROUP BY day")
+
+
+def usage_matrix(c, end, days=HISTORY_DAYS):
+    # Returns (item ids, [items x days] OUT volume) for the `days` days before `end`
+    start = end - timedelta(days=days)
+    rows = c.execute("SELECT item_id, day, qty_out FROM daily_usage WHERE day >= ? AND day < ? AND qty_out > 0",
+                     (start.isoformat(), end.isoformat())).fetchall()
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, days))
+    col = {(start + timedelta(days=n)).isoformat(): n for n in range(days)}
+    item_ids, row_idx = np.unique(np.array([r[0] for r in rows], dtype=np.int64), return_inverse=True)
+    usage = np.zeros((len(item_ids), days))
+    np.add.at(usage, (row_idx, [col[r[1]] for r in rows]), [r[2] for r in rows])
+    return item_ids, usage
+
+
+# --- FORECASTS ---
+def forecast(usage):
+    # Per item: (28-day mean, exponentially smoothed rate, 28-day standard deviation) of daily OUT
+    recent = usage[:, -MA_WINDOW:]
+    weights = ALPHA * (1 - ALPHA) ** np.arange(usage.shape[1] - 1, -1, -1)
+    rate = usage @ weights / weights.sum()
+    return recent.mean(axis=1), rate, recent.std(axis=1)
+
+
+def order_levels(rate, sd, lead=LEAD_TIME_DAYS, cover=COVER_DAYS, z=SERVICE_Z):
+    # Reorder when stock falls to lead-time demand plus safety stock; order up to enough for
+    # the lead time and the cover period on top
+    safety = z * sd * math.sqrt(lead)
+    return np.ceil(rate * lead + safety).astype(np.int64), np.ceil(rate * (lead + cover) + safety).astype(np.int64)
+
+
+@perf.traced('job', "refresh forecasts")
+def refresh_forecasts(c, today=None):
+    today = today or date.today()
+    item_ids, usage = usage_matrix(c, today)
+    avg, rate, sd = forecast(usage)
+    reorder_point, order_up_to = order_levels(rate, sd)
+    c.execute("DELETE FROM item_forecast")
+    c.executemany("INSERT INTO item_forecast (item_id, daily_avg, daily_rate, daily_sd, reorder_point, order_up_to, day) VALUES (?,?,?,?,?,?,?)",
+                  zip(item_ids.tolist(), avg.round(3).tolist(), rate.round(3).tolist(), sd.round(3).tolist(),
+                      reorder_point.tolist(), order_up_to.tolist(), [today.isoformat()] * len(item_ids)))
+    # Cached requisitions are keyed on the data version
+    c.execute("UPDATE meta SET value = value + 1 WHERE key = 'data_version'")
+    return len(item_ids)
+
+
+def maybe_refresh_forecasts(c):
+    today = date.today().isoformat()
+    last = c.execute("SELECT value FROM meta WHERE key = 'forecast_day'").fetchone()
+    if last and str(last[0]) == today:
+        return 0
+    n = refresh_forecasts(c)
+    c.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('forecast_day', ?)", (today,))
+    return n
+
+
+# --- TRENDS ---
+@perf.cache_data(show_spinner=False, max_entries=16)
+def daily_trend(version, start=None, item_id=None):
+    # Daily IN/OUT totals from the rollups; start is an ISO day or None for all time
+    if item_id is None:
+        sql, params = "SELECT day, qty_in, qty_out FROM daily_totals WHERE day >= ? ORDER BY day", (start or "",)
+    else:
+        sql, params = "SELECT day, qty_in, qty_out FROM daily_usage WHERE item_id = ? AND day >= ? ORDER BY day", (item_id, start or "")
+    df = db.read_df(sql, params, columns=['Day', 'IN', 'OUT'])
+    df['Day'] = df['Day'].astype('datetime64[ns]')
+    # Days without movements are absent from the rollup; charts want them as zeros
+    return df.set_index('Day').asfreq('D', fill_value=0)
@@ -0,0 +1,120 @@
+import io
+
+import pandas as pd
+
+import db
+import ledger
+import perf
+
+IMPORT_COLUMNS = ["Name", "Category", "Quantity", "Threshold", "Location"]
+CSV_CHUNK_ROWS = 50_000
+MAX_REPORTED_ERRORS = 500
+
+
+# --- READING ---
+def read_import_chunks(uploaded_file, chunksize=CSV_CHUNK_ROWS):
+    # CSVs stream in chunks; Excel has no streaming reader in pandas so it arrives whole
+    if uploaded_file.name.lower().endswith('csv'):
+        yield from pd.read_csv(uploaded_file, chunksize=chunksize, dtype=str, keep_default_na=False)
+    else:
+        yield pd.read_excel(uploaded_file, dtype=str, keep_default_na=False)
+
+
+# --- VALIDATION ---
+def clean_import_frame(df, row_offset=0):
+    # Returns (clean frame keyed on unique name, rejected frame of [Row, Name, Reason])
+    df = df.rename(columns={c: str(c).strip().title() for c in df.columns})
+    missing = [c for c in IMPORT_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    df = df[IMPORT_COLUMNS].copy()
+    # Spreadsheet row number: 1-based plus the header line
+    df['Row'] = range(row_offset + 2, row_offset + 2 + len(df))
+    df['Name'] = df['Name'].astype(str).str.strip()
+    df['Category'] = df['Category'].astype(str).str.strip()
+    df['Location'] = df['Location'].astype(str).str.strip()
+
+    reasons = pd.Series("", index=df.index)
+    for col in ("Quantity", "Threshold"):
+        raw = df[col].astype(str).str.strip().replace("", "0")
+        num = pd.to_numeric(raw, errors='coerce')
+        reasons = reasons.mask((reasons == "") & num.isna(), f"{col} is not a number")
+        reasons = reasons.mask((reasons == "") & (num < 0), f"{col} is negative")
+        reasons = reasons.mask((reasons == "") & num.notna() & (num % 1 != 0), f"{col} is not a whole number")
+        df[col] = num
+    reasons = reasons.mask(df['Name'].isin(["", "nan"]), "Name is empty")
+
+    bad = reasons != ""
+    rejected = pd.DataFrame({'Row': df.loc[bad, 'Row'], 'Name': df.loc[bad, 'Name'], 'Reason': reasons[bad]})
+
+    good = df[~bad].astype({'Quantity': 'int64', 'Threshold': 'int64'})
+    # Duplicate names inside the file: quantities add up, the last row wins for the rest
+    merged = good.groupby('Name', sort=False).agg(
+        Category=('Category', 'last'), Quantity=('Quantity', 'sum'),
+        Threshold=('Threshold', 'last'), Location=('Location', 'last'),
+    ).reset_index()
+    return merged, rejected
+
+
+# --- UPSERT ---
+STAGE_UPSERT = """
+    INSERT INTO import_staging (name, category, quantity, threshold, location) VALUES (?,?,?,?,?)
+    ON CONFLICT(name) DO UPDATE SET
+        category = excluded.category, quantity = quantity + excluded.quantity,
+        threshold = excluded.threshold, location = excluded.location
+"""
+
+ITEMS_UPSERT = """
+    INSERT INTO items (name, category, quantity, threshold, location)
+    SELECT name, category, quantity, threshold, location FROM import_staging WHERE true
+    ON CONFLICT(name) DO UPDATE SET
+        quantity = quantity + excluded.quantity,
+        threshold = excluded.threshold,
+        location = excluded.location
+"""
+
+
+LEDGER_INSERT = """
+    INSERT INTO stock_moves (item_id, user_id, type, qty_change, ts, note)
+    SELECT i.id, (SELECT id FROM users WHERE username = ?), 'IN', s.quantity, ?, 'Bulk Import'
+    FROM import_staging s JOIN items i ON i.name = s.name WHERE s.quantity > 0
+"""
+
+
+@perf.traced('import')
+def import_items(chunks, user=None, progress=None, total_rows=None):
+    rejected, offset = [], 0
+    with db.connection() as conn:
+        # Parsing and validation fill a TEMP table, which needs no lock on the main database;
+        # the write lock is only held for the two set-based statements at the end.
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS import_staging (name TEXT PRIMARY KEY, category TEXT, quantity INTEGER, threshold INTEGER, location TEXT)")
+        conn.execute("DELETE FROM import_staging")
+        for chunk in chunks:
+            clean, bad = clean_import_frame(chunk, offset)
+            offset += len(chunk)
+            rejected.append(bad)
+            conn.execute("BEGIN")
+            conn.executemany(STAGE_UPSERT, clean[IMPORT_COLUMNS].astype(object).itertuples(index=False, name=None))
+            conn.execute("COMMIT")
+            if progress:
+                progress(offset, total_rows, f"{offset} rows validated")
+
+        with db.transaction(conn):
+            staged = conn.execute("SELECT count(*) FROM import_staging").fetchone()[0]
+            updated = conn.execute("SELECT count(*) FROM import_staging s JOIN items i ON i.name = s.name").fetchone()[0]
+            conn.execute(ITEMS_UPSERT)
+            conn.execute(LEDGER_INSERT, (user, ledger.epoch()))
+        conn.execute("DELETE FROM import_staging")
+
+    rejected = pd.concat(rejected, ignore_index=True) if rejected else pd.DataFrame(columns=['Row', 'Name', 'Reason'])
+    return {'inserted': staged - updated, 'updated': updated, 'rejected': len(rejected), 'errors': rejected}
+
+
+def import_file(data, filename, user=None, progress=None):
+    # Background-job entry point: works from the uploaded bytes and returns a JSON-friendly summary
+    upload = io.BytesIO(data)
+    upload.name = filename
+    summary = import_items(read_import_chunks(upload), user, progress)
+    summary['errors'] = summary['errors'].head(MAX_REPORTED_ERRORS).to_dict('records')
+    return summary
@@ -0,0 +1,139 @@
+import sqlite3
+
+import bom
+import db
+import ledger
+import loans
+
+
+class InsufficientStock(Exception):
+    def __init__(self, shortages):
+        # shortages: [(item_name, required, in_stock), ...]
+        self.shortages = shortages
+        super().__init__(", ".join(f"{n} (need {req}, have {have})" for n, req, have in shortages))
+
+
+# --- ITEMS ---
+def add_item(name, category, quantity, threshold, location, user=None, returnable=False):
+    # Opening stock goes through the ledger so items.quantity always reconciles with stock_moves
+    try:
+        with db.transaction() as conn:
+            item_id = conn.execute("INSERT INTO items (name, category, quantity, threshold, location, returnable) VALUES (?,?,?,?,?,?)",
+                                   (name, category, quantity, threshold, location, int(returnable))).lastrowid
+            if quantity > 0:
+                ledger.record_moves(conn, [(item_id, user, "IN", quantity, "Opening Stock")])
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def adjust_stock(item_id, qty, user, note=None, loan=None):
+    # Single-item receive (qty > 0) or consume (qty < 0); relative, so concurrent edits both land.
+    # loan=(borrower, due) on a deduct lends the units instead of consuming them; only returnable items go on loan.
+    kind = "IN" if qty > 0 else "OUT"
+    loan = loan if qty < 0 else None
+    if loan:
+        note = note or f"Loan to {loan[0]}"
+    with db.transaction() as conn:
+        if loan and not loans.returnable_ids(conn, [item_id]):
+            raise ValueError("Only returnable equipment can be lent; consumables are deducted.")
+        if qty > 0:
+            conn.execute("UPDATE items SET quantity = quantity + ? WHERE id = ?", (qty, item_id))
+        else:
+            cur = conn.execute("UPDATE items SET quantity = quantity - ? WHERE id = ? AND quantity >= ?", (-qty, item_id, -qty))
+            if cur.rowcount != 1:
+                row = conn.execute("SELECT name, quantity FROM items WHERE id = ?", (item_id,)).fetchone()
+                raise InsufficientStock([(row[0] if row else item_id, -qty, row[1] if row else 0)])
+        loan_id = loans.lend(conn, *loan, user, {item_id: -qty}, note=note) if loan else None
+        ledger.record_moves(conn, [(item_id, user, kind, abs(qty), note or ("Manual Restock" if qty > 0 else "Manual Usage"))], loan_id)
+
+
+def apply_batch(deltas, user, note=None):
+    # deltas: {item_id: signed qty}. The whole batch lands in one transaction or not at all;
+    # returns how many items moved.
+    deltas = {int(i): int(q) for i, q in deltas.items() if q}
+    if not deltas:
+        return 0
+    note = note or "Scan Batch"
+    with db.transaction() as conn:
+        outs = {i: -q for i, q in deltas.items() if q < 0}
+        if outs:
+            shortages = _shortages(conn, outs)
+            if shortages:
+                raise InsufficientStock(shortages)
+            _take(conn, outs)
+        ins = [(q, i) for i, q in deltas.items() if q > 0]
+        if ins:
+            conn.executemany("UPDATE items SET quantity = quantity + ? WHERE id = ?", ins)
+        ledger.record_moves(conn, [(i, user, "IN" if q > 0 else "OUT", abs(q), note) for i, q in deltas.items()])
+    return len(deltas)
+
+
+# --- KIT LOOKUPS ---
+def get_kit_details(kit_id, conn=None):
+    # Returns the flattened bill of materials, one line per item with sub-kits multiplied out:
+    # [(name, qty_needed, current_stock, item_id), ...]. Only the stock is read fresh.
+    lines = bom.explode(kit_id, conn)
+    if not lines:
+        return []
+    sql = f"SELECT id, name, quantity FROM items WHERE id IN ({','.join('?' * len(lines))}) ORDER BY name"
+    rows = conn.execute(sql, list(lines)).fetchall() if conn is not None else db.read(sql, list(lines))
+    return [(name, lines[item_id], stock, item_id) for item_id, name, stock in rows]
+
+
+def kit_requirements(contents, kits=1):
+    # {item_id: (name, qty needed for `kits` kits, stock)}
+    return {item_id: (name, qty_needed * kits, stock) for name, qty_needed, stock, item_id in contents}
+
+
+# --- GUARDED DECREMENTS ---
+def _shortages(conn, needs):
+    # needs: {item_id: qty}; [(name, need, have), ...] for the items that cannot cover it
+    marks = ",".join("?" * len(needs))
+    stock = {i: (n, q) for i, n, q in conn.execute(f"SELECT id, name, quantity FROM items WHERE id IN ({marks})", list(needs))}
+    shortages = []
+    for item_id, need in needs.items():
+        name, have = stock.get(item_id, (f"#{item_id}", 0))
+        if need > have:
+            shortages.append((name, need, have))
+    return shortages
+
+
+def _take(conn, needs):
+    # Relative, guarded decrements in one batch. If a guard fails the whole batch is undone and
+    # the shortfall is re-read, so the error names only the items that are really short.
+    conn.execute("SAVEPOINT take_stock")
+    cur = conn.executemany("UPDATE items SET quantity = quantity - ? WHERE id = ? AND quantity >= ?",
+                           [(need, item_id, need) for item_id, need in needs.items()])
+    if cur.rowcount != len(needs):
+        conn.execute("ROLLBACK TO take_stock")
+        conn.execute("RELEASE take_stock")
+        raise InsufficientStock(_shortages(conn, needs))
+    conn.execute("RELEASE take_stock")
+
+
+# --- KIT ISSUANCE ---
+def issue_kit(kit_id, kit_name, user, kits=1, note=None, loan=None):
+    # loan=(borrower, due) lends the kit's returnable components; consumables are issued as usual
+    if kits < 1:
+        raise ValueError("kits must be at least 1")
+    note = note or (f"Kit: {kit_name}" if kits == 1 else f"Kit: {kit_name} x{kits}")
+    if loan:
+        note = f"{note} (loan to {loan[0]})"
+    with db.transaction() as conn:
+        # Stock is re-read under the write lock, so the check cannot go stale before the update
+        req = kit_requirements(get_kit_details(kit_id, conn), kits)
+        if not req:
+            raise ValueError(f"Kit '{kit_name}' has no components")
+        shortages = [(name, need, stock) for name, need, stock in req.values() if need > stock]
+        if shortages:
+            raise InsufficientStock(shortages)
+
+        _take(conn, {item_id: need for item_id, (_, need, _) in req.items()})
+
+        lent = {item_id: req[item_id][1] for item_id in loans.returnable_ids(conn, req)} if loan else {}
+        ledger.record_moves(conn, [(item_id, user, "OUT", need, note) for item_id, (_, need, _) in req.items() if item_id not in lent])
+        if lent:
+            loan_id = loans.lend(conn, *loan, user, lent, kit_id=kit_id, note=note)
+            ledger.record_moves(conn, [(item_id, user, "OUT", need, note) for item_id, need in lent.items()], loan_id)
+    return len(req)
@@ -0,0 +1,159 @@
+import inspect
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+import db
+import perf
+
+# Long operations (bulk import, large exports, mass kit issuance) run on a process-wide thread
+# pool; their state lives in the jobs table so any rerun, in any session, can report on them.
+WORKERS = 2
+ACTIVE = ('queued', 'running')
+PROGRESS_EVERY_S = 0.5
+RECENT_S = 24 * 3600          # how long finished jobs (and their export files) are kept around
+# Above these sizes the UI hands the work to the pool instead of doing it inside the rerun
+BACKGROUND_EXPORT_ROWS = 20_000
+BACKGROUND_KITS = 10
+# Every job row names the process whose pool runs it, so start-up recovery only fails jobs whose
+# process is gone, never ones still running in another live server or an older runner of this one
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+_recovery = {'done': False, 'lock': threading.Lock()}
+
+
+class JobRunner:
+    def __init__(self, workers=WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="robolab-job")
+
+    def submit(self, kind, label, user, fn, *args, **kwargs):
+        # fn's return value must be JSON-serialisable; fn gets progress=callback if it takes one
+        with db.transaction() as c:
+            job_id = c.execute("INSERT INTO jobs (kind, label, user, status, progress, created_ts, owner) VALUES (?,?,?,'queued',0,?,?)",
+                               (kind, label, user, int(time.time()), OWNER)).lastrowid
+        self.executor.submit(self._run, job_id, kind, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job_id, kind, fn, args, kwargs):
+        db.write("UPDATE jobs SET status = 'running', started_ts = ? WHERE id = ?", (int(time.time()), job_id))
+        last = [0.0]
+
+        def progress(done, total=None, message=None):
+            # Throttled: a progress row per chunk would contend with the app's own writes
+            now = time.monotonic()
+            if now - last[0] < PROGRESS_EVERY_S:
+                return
+            last[0] = now
+            fraction = min(done / total, 1.0) if total else None
+            db.write("UPDATE jobs SET progress = COALESCE(?, progress), message = ? WHERE id = ?", (fraction, message, job_id))
+
+        try:
+            with perf.timed('job', kind):
+                if 'progress' in inspect.signature(fn).parameters:
+                    kwargs = dict(kwargs, progress=progress)
+                result = fn(*args, **kwargs)
+        except Exception as e:
+            db.write("UPDATE jobs SET status = 'failed', error = ?, message = ?, finished_ts = ? WHERE id = ?",
+                     (str(e) or type(e).__name__, traceback.format_exc(limit=3), int(time.time()), job_id))
+        else:
+            db.write("UPDATE jobs SET status = 'done', progress = 1, result = ?, finished_ts = ? WHERE id = ?",
+                     (json.dumps(result, default=str), int(time.time()), job_id))
+
+
+@st.cache_resource(show_spinner=False)
+def get_runner(db_file):
+    return JobRunner()
+
+
+def submit(kind, label, user, fn, *args, **kwargs):
+    return get_runner(db.DB_FILE).submit(kind, label, user, fn, *args, **kwargs)
+
+
+# --- RECOVERY ---
+def _owner_alive(owner):
+    if not owner:
+        # Queued before owners were recorded, so by a server that has since restarted
+        return False
+    host, pid, _ = owner.rsplit(":", 2)
+    if host != socket.gethostname():
+        # Another host's processes cannot be probed; leave its jobs alone
+        return True
+    if int(pid) == os.getpid():
+        # Our pid under another token belonged to a process that exited before this one started
+        return owner == OWNER
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def recover_interrupted():
+    # Once per process at start-up: queued or running jobs whose process has died will never
+    # finish, and would otherwise keep the job tray polling and the maintenance scheduler waiting
+    with _recovery['lock']:
+        if _recovery['done']:
+            return 0
+        _recovery['done'] = True
+    owners = [r[0] for r in db.read("SELECT DISTINCT owner FROM jobs WHERE status IN ('queued', 'running')")]
+    dead = [(int(time.time()), owner) for owner in owners if not _owner_alive(owner)]
+    if dead:
+        db.write_many("""UPDATE jobs SET status = 'failed', error = 'Interrupted by a server restart', finished_ts = ?
+            WHERE status IN ('queued', 'running') AND owner IS ?""", dead)
+    return len(dead)
+
+
+# --- QUERIES ---
+JOB_COLUMNS = "id, kind, label, status, progress, message, result, error, created_ts, finished_ts"
+
+
+def _rows(rows):
+    keys = [k.strip() for k in JOB_COLUMNS.split(",")]
+    jobs = [dict(zip(keys, r)) for r in rows]
+    for job in jobs:
+        job['result'] = json.loads(job['result']) if job['result'] else None
+    return jobs
+
+
+def recent(user, limit=5):
+    return _rows(db.read(f"SELECT {JOB_COLUMNS} FROM jobs WHERE user = ? AND created_ts >= ? ORDER BY id DESC LIMIT ?",
+                         (user, int(time.time()) - RECENT_S, limit)))
+
+
+def has_active(user):
+    return db.read_one("SELECT 1 FROM jobs WHERE user = ? AND status IN ('queued', 'running')", (user,)) is not None
+
+
+def take_finished(user):
+    # Jobs that finished since the user was last told. Checked every rerun, so the common
+    # case is one indexed read and no write.
+    rows = db.read(f"SELECT {JOB_COLUMNS} FROM jobs WHERE user = ? AND notified = 0 AND status IN ('done', 'failed') ORDER BY id", (user,))
+    if rows:
+        db.write_many("UPDATE jobs SET notified = 1 WHERE id = ?", [(r[0],) for r in rows])
+    return _rows(rows)
+
+
+def get(job_id):
+    rows = db.read(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,))
+    return _rows(rows)[0] if rows else None
+
+
+def prune_results(max_age_s=RECENT_S):
+    # Export files of jobs older than max_age_s are deleted; the job rows stay as history
+    import exporter
+    cutoff = int(time.time()) - max_age_s
+    removed = 0
+    for job in _rows(db.read(f"SELECT {JOB_COLUMNS} FROM jobs WHERE kind = 'export' AND status = 'done' AND finished_ts < ? AND result IS NOT NULL", (cutoff,))):
+        exporter.discard(job['result'])
+        removed += 1
+    if removed:
+        db.write("UPDATE jobs SET result = NULL WHERE kind = 'export' AND status = 'done' AND finished_ts < ?", (cutoff,))
+    return removed
@@ -0,0 +1,101 @@
+from datetime import datetime
+
+import db
+
+# stock_moves is the authoritative stock ledger: every row carries the running balance of
+# its item after the movement, and stock_snapshots pins that balance every SNAPSHOT_EVERY
+# movements so point-in-time and reconciliation queries only replay a bounded tail.
+# Timestamps are epoch seconds (UTC); opening snapshots sit at ts 0.
+SNAPSHOT_EVERY = 100
+SIGNED_QTY = "CASE m.type WHEN 'OUT' THEN -m.qty_change ELSE m.qty_change END"
+
+BALANCE_TRIGGER = """CREATE TRIGGER IF NOT EXISTS ledger_balance AFTER INSERT ON stock_moves BEGIN
+    UPDATE stock_moves SET balance = COALESCE(
+        (SELECT p.balance FROM stock_moves p WHERE p.item_id = NEW.item_id AND p.id < NEW.id ORDER BY p.id DESC LIMIT 1),
+        (SELECT s.balance FROM stock_snapshots s WHERE s.item_id = NEW.item_id ORDER BY s.txn_id DESC LIMIT 1),
+        0) + CASE NEW.type WHEN 'OUT' THEN -NEW.qty_change ELSE NEW.qty_change END
+    WHERE id = NEW.id;
+END"""
+
+MOVE_INSERT = """INSERT INTO stock_moves (item_id, user_id, type, qty_change, ts, note, loan_id)
+    VALUES (?, (SELECT id FROM users WHERE username = ?), ?, ?, ?, ?, ?)"""
+
+
+def epoch(when=None):
+    if when is None:
+        when = datetime.now()
+    elif isinstance(when, str):
+        when = datetime.fromisoformat(when)
+    return int(when.timestamp())
+
+
+# --- WRITES ---
+def record_moves(conn, moves, loan_id=None):
+    # moves: [(item_id, username, 'IN'|'OUT', qty, note), ...]; call inside the caller's transaction.
+    # loan_id tags lending and returns, which move stock but are not usage.
+    ts = epoch()
+    conn.executemany(MOVE_INSERT, [(int(i), user, kind, int(q), ts, note, loan_id) for i, user, kind, q, note in moves])
+
+
+# --- SNAPSHOTS ---
+def take_snapshots(conn, every=SNAPSHOT_EVERY):
+    # Pins the latest balance of every item that moved at least `every` times since its last snapshot
+    cur = conn.execute("""INSERT OR IGNORE INTO stock_snapshots (item_id, txn_id, balance, ts)
+        SELECT m.item_id, m.id, m.balance, m.ts FROM stock_moves m JOIN (
+            SELECT mx.item_id, MAX(mx.id) AS last_id FROM stock_moves mx
+            WHERE mx.id > COALESCE((SELECT MAX(s.txn_id) FROM stock_snapshots s WHERE s.item_id = mx.item_id), 0)
+            GROUP BY mx.item_id HAVING COUNT(*) >= ?
+        ) d ON m.id = d.last_id""", (every,))
+    return cur.rowcount
+
+
+def maybe_take_snapshots(conn):
+    # Once a day is enough to keep every replay tail short
+    today = datetime.now().strftime('%Y-%m-%d')
+    last = conn.execute("SELECT value FROM meta WHERE key = 'last_snapshot_day'").fetchone()
+    if last and str(last[0]) == today:
+        return 0
+    taken = take_snapshots(conn)
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_snapshot_day', ?)", (today,))
+    return taken
+
+
+# --- POINT-IN-TIME QUERIES ---
+def stock_levels_at(when, item_id=None):
+    # Nearest snapshot at or before `when` per item, plus the movements between it and `when`;
+    # item_id narrows every step to one item
+    only = "" if item_id is None else " AND {col} = :item"
+    return db.read_df(f"""
+        WITH base AS (
+            SELECT s.item_id, s.txn_id, s.balance FROM stock_snapshots s
+            WHERE s.txn_id = (SELECT MAX(s2.txn_id) FROM stock_snapshots s2 WHERE s2.item_id = s.item_id AND s2.ts <= :when){only.format(col='s.item_id')}
+        ),
+        delta AS (
+            SELECT m.item_id, SUM({SIGNED_QTY}) AS moved FROM stock_moves m LEFT JOIN base b ON b.item_id = m.item_id
+            WHERE m.id > COALESCE(b.txn_id, 0) AND m.ts <= :when{only.format(col='m.item_id')} GROUP BY m.item_id
+        )
+        SELECT i.id, i.name, COALESCE(b.balance, 0) + COALESCE(d.moved, 0) AS stock
+        FROM items i LEFT JOIN base b ON b.item_id = i.id LEFT JOIN delta d ON d.item_id = i.id
+        WHERE 1{only.format(col='i.id')} ORDER BY i.name""", {'when': epoch(when), 'item': item_id}, columns=['ID', 'Item', 'Stock'])
+
+
+def stock_at(item_id, when):
+    levels = stock_levels_at(when, item_id)
+    return int(levels['Stock'].iloc[0]) if len(levels) else 0
+
+
+# --- RECONCILIATION ---
+def check_consistency():
+    # Latest snapshot + tail per item in one aggregate pass; returns the items whose stock disagrees
+    return db.read_df(f"""
+        WITH base AS (
+            SELECT s.item_id, s.txn_id, s.balance FROM stock_snapshots s
+            WHERE s.txn_id = (SELECT MAX(s2.txn_id) FROM stock_snapshots s2 WHERE s2.item_id = s.item_id)
+        ),
+        delta AS (
+            SELECT m.item_id, SUM({SIGNED_QTY}) AS moved FROM stock_moves m LEFT JOIN base b ON b.item_id = m.item_id
+            WHERE m.id > COALESCE(b.txn_id, 0) GROUP BY m.item_id
+        )
+        SELECT i.id, i.name, i.quantity, COALESCE(b.balance, 0) + COALESCE(d.moved, 0) AS ledger
+        FROM items i LEFT JOIN base b ON b.item_id = i.id LEFT JOIN delta d ON d.item_id = i.id
+        WHERE i.quantity != COALESCE(b.balance, 0) + COALESCE(d.moved, 0)""", columns=['ID', 'Item', 'Stock', 'Ledger'])
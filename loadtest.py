@@ -0,0 +1,362 @@
+"""Concurrent load test: N simulated users driving the real pages of App1.py.
+
+    python loadtest.py --db /tmp/load.db --users 1 2 4 8 --duration 30 --out load.json
+
+Each simulated user is a headless AppTest session running App1.py in its own process
+(AppTest keeps per-run global state, so sessions cannot share an interpreter). They contend
+for the one database file as the sessions of a busy server do, though each warms its own
+caches and connection pool. All N sign in first, then loop over a weighted mix of Dashboard
+views, kit issues, restocks, deductions and (for admins) Reports until the level's time is
+up. Every level starts from a fresh copy of the template database, which is built with
+bench.py's synthetic data if --db does not exist.
+
+Per level the report has latency per step, rerun throughput (sign-in left out), lock/busy
+errors, and any item whose quantity disagrees with its ledger or with the net of the
+writes the UI confirmed (a lost or phantom update).
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import streamlit as st
+import streamlit.logger
+
+import bench
+import db
+import perf
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "App1.py")
+MENU_KEY = '_loadtest_page'
+ADMIN_EVERY = 4            # every fourth simulated user signs in as admin
+MIX = {'dashboard': 3, 'issue_kit': 2, 'restock': 2, 'deduct': 1, 'reports': 1}
+ADMIN_ONLY = {'reports'}
+LOCK_WORDS = ("database is locked", "database table is locked", "busy")
+MAX_QTY = 5
+BARRIER_TIMEOUT_S = 300    # sessions start in fresh interpreters; signing in N of them takes a while
+
+
+def _menu(*args, options=None, default_index=0, **kwargs):
+    # Stands in for the sidebar's option menu, which needs a browser: returns the page the
+    # simulated user asked for, if their role has it
+    options = options if options is not None else args[1]
+    wanted = st.session_state.get(MENU_KEY)
+    return wanted if wanted in options else options[default_index]
+
+
+# --- SIMULATED USER ---
+class SimUser:
+    def __init__(self, username, password, admin, rng, catalogue, timeout):
+        self.username, self.password = username, password
+        self.actions = [a for a in MIX if admin or a not in ADMIN_ONLY]
+        self.weights = [MIX[a] for a in self.actions]
+        self.rng = rng
+        self.kits, self.items, self.boms = catalogue
+        self.timeout = timeout
+        self.at = None
+        self.samples = []              # (step, ms)
+        self.errors = Counter()        # 'lock' / 'exception' / 'error' / 'harness'
+        self.messages = []
+        self.confirmed = Counter()     # item_id -> net qty the UI said it moved
+        self.writes = 0
+        self.rejected = 0
+        self.waits = []                # lock waits of this process's transactions, ms
+
+    def _problem(self, kind, text):
+        self.errors[kind] += 1
+        if len(self.messages) < 5:
+            self.messages.append(f"{self.username}: {kind}: {text[:200]}")
+
+    def _run(self, step, target=None):
+        # One rerun, timed; target is a widget with a pending value or click
+        t = time.perf_counter()
+        try:
+            (target or self.at).run()
+        except Exception as e:
+            # AppTest raises when a rerun outlives its timeout
+            self._problem('lock' if any(w in str(e).lower() for w in LOCK_WORDS) else 'harness', f"{step}: {e}")
+            return False
+        self.samples.append((step, (time.perf_counter() - t) * 1000))
+        ok = True
+        shown = [('exception', e.value) for e in self.at.exception] + [('error', e.value) for e in self.at.error]
+        for kind, text in shown:
+            text = str(text)
+            if text.startswith("Insufficient Stock"):
+                continue
+            self._problem('lock' if any(w in text.lower() for w in LOCK_WORDS) else kind, f"{step}: {text}")
+            ok = False
+        return ok
+
+    def _widget(self, elements, label):
+        return next((w for w in elements if w.label == label), None)
+
+    def _toasted(self, prefix):
+        return any(str(t.value).startswith(prefix) for t in self.at.toast)
+
+    def login(self):
+        from streamlit.testing.v1 import AppTest
+        self.at = AppTest.from_file(APP, default_timeout=self.timeout)
+        if not self._run("login page"):
+            return False
+        self.at.text_input[0].input(self.username)
+        self.at.text_input[1].input(self.password)
+        return self._run("login", self.at.button[0].click()) and self.at.session_state['logged_in']
+
+    def goto(self, page):
+        self.at.session_state[MENU_KEY] = page
+        return self._run(page)
+
+    def dashboard(self):
+        self.goto("Dashboard")
+
+    def reports(self):
+        self.goto("Reports")
+
+    def issue_kit(self):
+        if not self.goto("Stock & Kits"):
+            return
+        kit_id, name = self.rng.choice(self.kits)
+        select = self._widget(self.at.selectbox, "Select Activity Kit")
+        if select is None:
+            return self._problem('harness', "no kit selector")
+        if not self._run("select kit", select.select(name)):
+            return
+        button = self._widget(self.at.button, "ISSUE KIT")
+        if button is None:
+            # The page hides the button when stock is short
+            self.rejected += 1
+            return
+        if not self._run("issue kit", button.click()):
+            return
+        if self._toasted("Successfully issued"):
+            self.writes += 1
+            for item_id, qty in self.boms[kit_id].items():
+                self.confirmed[item_id] -= qty
+        else:
+            self.rejected += 1
+
+    def _adjust(self, sign):
+        if not self.goto("Stock & Kits"):
+            return
+        item_id, name = self.rng.choice(self.items)
+        if not self._run("search item", self.at.text_input(key='txn_item_query').input(name)):
+            return
+        picker = self.at.selectbox(key='txn_item')
+        if name not in picker.options:
+            return self._problem('harness', f"search did not offer {name}")
+        # A browser reruns on every selectbox change; the button's callback is bound to the item
+        # shown when it was drawn, so the pick has to land before the click
+        if picker.value != name and not self._run("pick item", picker.select(name)):
+            return
+        qty = self.rng.randint(1, MAX_QTY)
+        self.at.number_input(key='in' if sign > 0 else 'out').set_value(qty)
+        button = self._widget(self.at.button, "Add to Stock" if sign > 0 else "Deduct from Stock")
+        if not self._run("restock" if sign > 0 else "deduct", button.click()):
+            return
+        if self._toasted("Added" if sign > 0 else "Deducted"):
+            self.writes += 1
+            self.confirmed[item_id] += sign * qty
+        else:
+            self.rejected += 1
+
+    def restock(self):
+        self._adjust(1)
+
+    def deduct(self):
+        self._adjust(-1)
+
+    def run(self, barrier, duration, barrier_timeout):
+        try:
+            ready = self.login()
+        except Exception as e:
+            ready = False
+            self._problem('harness', f"login: {type(e).__name__}: {e}")
+        # Everyone signs in first, so the timed window has all N sessions going at once
+        try:
+            barrier.wait(barrier_timeout)
+        except threading.BrokenBarrierError:
+            return self._problem('harness', "gave up waiting for the other sessions to sign in")
+        if not ready:
+            return self._problem('harness', "login failed")
+        started, deadline = time.time(), time.monotonic() + duration
+        try:
+            while time.monotonic() < deadline:
+                getattr(self, self.rng.choices(self.actions, self.weights)[0])()
+        except Exception as e:
+            self._problem('harness', f"{type(e).__name__}: {e}")
+        self.waits = [e[6] for e in perf.events() if e[2] == 'txn' and e[1] >= started and e[6] is not None]
+
+    def result(self):
+        return {'samples': self.samples, 'errors': dict(self.errors), 'messages': self.messages, 'confirmed': dict(self.confirmed),
+                'writes': self.writes, 'rejected': self.rejected, 'waits': self.waits}
+
+
+def _worker(db_file, spec, catalogue, duration, timeout, barrier, results):
+    # One process per session: AppTest swaps Streamlit's global Runtime in and out around every
+    # run, so two sessions cannot share an interpreter
+    db.DB_FILE = db_file
+    streamlit.logger.set_log_level(logging.ERROR)
+    # AppTest puts the log level back to INFO on every run, and cached calls made outside a
+    # script run would log a context warning each
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").disabled = True
+    import streamlit_option_menu
+    streamlit_option_menu.option_menu = _menu
+    username, password, admin, seed = spec
+    user = SimUser(username, password, admin, random.Random(seed), catalogue, timeout)
+    try:
+        user.run(barrier, duration, BARRIER_TIMEOUT_S)
+    finally:
+        results.put(user.result())
+
+
+# --- LEVELS ---
+def _copy(src, dst):
+    # Through the backup API, so a template left in WAL mode copies whole
+    source, target = sqlite3.connect(src), sqlite3.connect(dst)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+
+
+def audit(before, first_move, confirmed):
+    # Per item: the quantity must move by exactly the ledger's net, must equal the last running
+    # balance, and must match the net of the writes the UI confirmed
+    after = dict(db.read("SELECT id, quantity FROM items"))
+    ledger = dict(db.read("SELECT item_id, SUM(CASE type WHEN 'IN' THEN qty_change ELSE -qty_change END) FROM stock_moves WHERE id > ? GROUP BY item_id",
+                          (first_move,)))
+    balance = dict(db.read("SELECT item_id, balance FROM stock_moves WHERE id IN (SELECT MAX(id) FROM stock_moves GROUP BY item_id)"))
+    anomalies = []
+    for item_id, qty in after.items():
+        moved = qty - before.get(item_id, 0)
+        if moved != ledger.get(item_id, 0) or moved != confirmed.get(item_id, 0) or qty != balance.get(item_id, qty) or qty < 0:
+            anomalies.append({'item_id': item_id, 'before': before.get(item_id), 'after': qty, 'ledger_net': ledger.get(item_id, 0),
+                              'confirmed_net': confirmed.get(item_id, 0), 'balance': balance.get(item_id)})
+    return anomalies
+
+
+def run_level(template, workdir, users, duration, seed, timeout):
+    import bom
+    work = os.path.join(workdir, f"load-{users}.db")
+    _copy(template, work)
+    db.DB_FILE = work
+
+    before = dict(db.read("SELECT id, quantity FROM items"))
+    first_move = db.read_value("SELECT MAX(id) FROM stock_moves", default=0)
+    kits = db.read("SELECT id, name FROM kits")
+    catalogue = (kits, db.read("SELECT id, name FROM items WHERE threshold >= 0"), {k: bom.explode(k) for k, _ in kits})
+    staff = [r[0] for r in db.read("SELECT username FROM users WHERE role = 'staff' ORDER BY username")]
+    specs = []
+    for n in range(users):
+        admin = n % ADMIN_EVERY == 0 or not staff
+        name = "admin" if admin else staff[n % len(staff)]
+        specs.append((name, "admin123" if admin else name, admin, seed * 1000 + n))
+
+    ctx = multiprocessing.get_context("spawn")
+    barrier, queue = ctx.Barrier(users + 1), ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(work, spec, catalogue, duration, timeout, barrier, queue), name=f"loadtest-{n}")
+             for n, spec in enumerate(specs)]
+    for p in procs:
+        p.start()
+    try:
+        barrier.wait(BARRIER_TIMEOUT_S)
+    except threading.BrokenBarrierError:
+        pass
+    start = time.perf_counter()
+    # Read before joining: a child blocks on exit until its queued result is taken
+    sims = [queue.get() for _ in procs]
+    elapsed = time.perf_counter() - start
+    for p in procs:
+        p.join()
+
+    confirmed, errors = Counter(), Counter()
+    for s in sims:
+        confirmed.update(s['confirmed'])
+        errors.update(s['errors'])
+    anomalies = audit(before, first_move, confirmed)
+    db.get_pool(work).close()
+
+    samples = [x for s in sims for x in s['samples'] if x[0] not in ("login page", "login")]
+    by_step = {}
+    for step, ms in (x for s in sims for x in s['samples']):
+        by_step.setdefault(step, []).append(ms)
+    waits = [w for s in sims for w in s['waits']]
+    writes = sum(s['writes'] for s in sims)
+    return {
+        'users': users,
+        'elapsed_s': round(elapsed, 2),
+        'reruns': bench.summarize([ms for _, ms in samples], elapsed) if samples else None,
+        'steps': {step: bench.summarize(ms, elapsed) for step, ms in sorted(by_step.items())},
+        'writes_confirmed': writes,
+        'writes_per_s': round(writes / elapsed, 2),
+        'rejected': sum(s['rejected'] for s in sims),
+        'lock_wait': bench.summarize(waits, elapsed) if waits else None,
+        'lock_errors': errors['lock'],
+        'errors': dict(errors),
+        'error_samples': [m for s in sims for m in s['messages']][:10],
+        'anomalies': anomalies[:50],
+        'anomaly_count': len(anomalies),
+    }
+
+
+def print_level(level):
+    reruns = level['reruns'] or {}
+    print(f"\n{level['users']} users, {level['elapsed_s']}s: {reruns.get('n', 0)} reruns ({reruns.get('ops_per_s') or 0} /s), "
+          f"{level['writes_confirmed']} writes ({level['writes_per_s']} /s), {level['rejected']} rejected, "
+          f"{level['lock_errors']} lock errors, {sum(level['errors'].values())} errors, {level['anomaly_count']} anomalies", file=sys.stderr)
+    if level['lock_wait']:
+        print(f"  {'lock wait':24s} p50 {level['lock_wait']['p50_ms']:9.2f} ms   p95 {level['lock_wait']['p95_ms']:9.2f} ms   "
+              f"max {level['lock_wait']['max_ms']:9.2f} ms", file=sys.stderr)
+    for step, s in level['steps'].items():
+        print(f"  {step:24s} p50 {s['p50_ms']:9.2f} ms   p95 {s['p95_ms']:9.2f} ms   max {s['max_ms']:9.2f} ms   n {s['n']}", file=sys.stderr)
+    for message in level['error_samples']:
+        print(f"  ! {message}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive N concurrent simulated users through the RoboLab pages")
+    parser.add_argument("--db", required=True, help="template database; generated with bench.py data if missing")
+    parser.add_argument("--scale", choices=bench.SCALES, default="small", help="synthetic data size when generating")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 2, 4, 8], help="concurrency levels to run")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per level")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds before one rerun counts as hung")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="write JSON results here (default: stdout)")
+    args = parser.parse_args(argv)
+    streamlit.logger.set_log_level(logging.ERROR)
+
+    if not os.path.exists(args.db):
+        started = time.perf_counter()
+        counts = bench.generate(args.db, **bench.SCALES[args.scale])
+        print(f"generated {counts} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    workdir = tempfile.mkdtemp(prefix="robolab-load-")
+    try:
+        levels = []
+        for users in args.users:
+            levels.append(run_level(args.db, workdir, users, args.duration, args.seed, args.timeout))
+            print_level(levels[-1])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    db.DB_FILE = args.db
+    report = {'environment': bench.environment(args.db), 'duration_s': args.duration, 'levels': levels}
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+from datetime import date, timedelta
+
+import db
+import ledger
+
+# Reusable equipment (items.returnable) goes out on a loan instead of being consumed. loans and
+# loan_lines keep the full history; open_loans holds one row per loan that still has anything
+# out, with the units outstanding, and triggers on loan_lines keep it current. The "currently
+# out" and "overdue" views and check-in therefore only touch open loans, through the due and
+# borrower indexes, however many loans have been closed. Due dates are local 'YYYY-MM-DD'.
+DEFAULT_DAYS = 7
+
+OPEN_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS loan_line_out AFTER INSERT ON loan_lines BEGIN
+        INSERT INTO open_loans (loan_id, borrower, due, qty_open)
+        SELECT id, borrower, due, NEW.qty_out - NEW.qty_returned FROM loans WHERE id = NEW.loan_id
+        ON CONFLICT (loan_id) DO UPDATE SET qty_open = qty_open + excluded.qty_open;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS loan_line_returned AFTER UPDATE OF qty_returned ON loan_lines BEGIN
+        UPDATE open_loans SET qty_open = qty_open - (NEW.qty_returned - OLD.qty_returned) WHERE loan_id = NEW.loan_id;
+        DELETE FROM open_loans WHERE loan_id = NEW.loan_id AND qty_open <= 0;
+        UPDATE loans SET closed_ts = CAST(strftime('%s', 'now') AS INTEGER)
+        WHERE id = NEW.loan_id AND closed_ts IS NULL AND NOT EXISTS (SELECT 1 FROM open_loans WHERE loan_id = NEW.loan_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS loan_rescheduled AFTER UPDATE OF borrower, due ON loans BEGIN
+        UPDATE open_loans SET borrower = NEW.borrower, due = NEW.due WHERE loan_id = NEW.id;
+    END""",
+)
+
+
+class NotOnLoan(ValueError):
+    pass
+
+
+# --- SCHEMA ---
+def init_loans(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS loans (id INTEGER PRIMARY KEY AUTOINCREMENT, borrower TEXT NOT NULL,
+        user_id INTEGER REFERENCES users(id), kit_id INTEGER REFERENCES kits(id), note TEXT,
+        out_ts INTEGER NOT NULL, due TEXT NOT NULL, closed_ts INTEGER)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS loan_lines (loan_id INTEGER NOT NULL REFERENCES loans(id),
+        item_id INTEGER NOT NULL REFERENCES items(id), qty_out INTEGER NOT NULL CHECK (qty_out > 0),
+        qty_returned INTEGER NOT NULL DEFAULT 0 CHECK (qty_returned BETWEEN 0 AND qty_out),
+        PRIMARY KEY (loan_id, item_id)) WITHOUT ROWID''')
+    c.execute('''CREATE TABLE IF NOT EXISTS open_loans (loan_id INTEGER PRIMARY KEY REFERENCES loans(id),
+        borrower TEXT NOT NULL, due TEXT NOT NULL, qty_open INTEGER NOT NULL)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_open_loans_due ON open_loans(due)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_open_loans_borrower ON open_loans(borrower, due)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_loans_borrower ON loans(borrower, out_ts)")
+    for trigger in OPEN_TRIGGERS:
+        c.execute(trigger)
+
+
+def default_due():
+    return date.today() + timedelta(days=DEFAULT_DAYS)
+
+
+def _due(due):
+    return (due if isinstance(due, date) else date.fromisoformat(str(due))).isoformat()
+
+
+# --- LENDING ---
+def lend(conn, borrower, due, user, lines, kit_id=None, note=None):
+    # lines: {item_id: qty}. Records the loan only; the caller moves the stock and writes the
+    # OUT moves, tagged with the returned loan id, in the same transaction.
+    borrower = (borrower or "").strip()
+    if not borrower:
+        raise ValueError("A loan needs a borrower")
+    lines = {int(i): int(q) for i, q in lines.items() if q > 0}
+    if not lines:
+        raise ValueError("Nothing to lend")
+    loan_id = conn.execute("""INSERT INTO loans (borrower, user_id, kit_id, note, out_ts, due)
+        VALUES (?, (SELECT id FROM users WHERE username = ?), ?, ?, ?, ?)""",
+                           (borrower, user, kit_id, note, ledger.epoch(), _due(due))).lastrowid
+    conn.executemany("INSERT INTO loan_lines (loan_id, item_id, qty_out) VALUES (?,?,?)",
+                     [(loan_id, i, q) for i, q in lines.items()])
+    return loan_id
+
+
+def returnable_ids(conn, item_ids):
+    item_ids = list(item_ids)
+    if not item_ids:
+        return set()
+    marks = ",".join("?" * len(item_ids))
+    return {r[0] for r in conn.execute(f"SELECT id FROM items WHERE returnable = 1 AND id IN ({marks})", item_ids)}
+
+
+def set_returnable(item_id, returnable):
+    return db.write("UPDATE items SET returnable = ? WHERE id = ?", (int(bool(returnable)), item_id))
+
+
+def reschedule(loan_id, due):
+    return db.write("UPDATE loans SET due = ? WHERE id = ? AND closed_ts IS NULL", (_due(due), loan_id))
+
+
+# --- RETURNS ---
+def check_in(loan_id, returns, user, note=None):
+    # returns: {item_id: qty}; any subset of the outstanding lines, partial quantities allowed.
+    # Returns the units still out on the loan (0 once it closes).
+    returns = {int(i): int(q) for i, q in returns.items() if q > 0}
+    if not returns:
+        return outstanding_units(loan_id)
+    with db.transaction() as conn:
+        return _check_in(conn, loan_id, returns, user, note)
+
+
+def return_all(loan_id, user, note=None):
+    # What is still out is read under the write lock, so a concurrent partial return cannot race it
+    with db.transaction() as conn:
+        returns = dict(conn.execute("SELECT item_id, qty_out - qty_returned FROM loan_lines WHERE loan_id = ? AND qty_returned < qty_out",
+                                    (loan_id,)).fetchall())
+        if not returns:
+            return 0
+        return _check_in(conn, loan_id, returns, user, note)
+
+
+def _check_in(conn, loan_id, returns, user, note):
+    cur = conn.executemany(
+        "UPDATE loan_lines SET qty_returned = qty_returned + ? WHERE loan_id = ? AND item_id = ? AND qty_returned + ? <= qty_out",
+        [(q, loan_id, i, q) for i, q in returns.items()],
+    )
+    if cur.rowcount != len(returns):
+        raise NotOnLoan(f"Loan #{loan_id} does not have that many units out")
+    conn.executemany("UPDATE items SET quantity = quantity + ? WHERE id = ?", [(q, i) for i, q in returns.items()])
+    ledger.record_moves(conn, [(i, user, "IN", q, note or f"Loan #{loan_id} return") for i, q in returns.items()], loan_id)
+    row = conn.execute("SELECT qty_open FROM open_loans WHERE loan_id = ?", (loan_id,)).fetchone()
+    return row[0] if row else 0
+
+
+# --- QUERIES ---
+def outstanding(loan_id):
+    # [(item_id, name, qty still out), ...]
+    return db.read("""SELECT ll.item_id, i.name, ll.qty_out - ll.qty_returned FROM loan_lines ll JOIN items i ON i.id = ll.item_id
+        WHERE ll.loan_id = ? AND ll.qty_returned < ll.qty_out ORDER BY i.name""", (loan_id,))
+
+
+def outstanding_units(loan_id):
+    return db.read_value("SELECT qty_open FROM open_loans WHERE loan_id = ?", (loan_id,), default=0)
+
+
+def summary(today=None):
+    today = _due(today or date.today())
+    open_count, overdue, units = db.read_one(
+        "SELECT COUNT(*), COALESCE(SUM(due < ?), 0), COALESCE(SUM(qty_open), 0) FROM open_loans", (today,))
+    return {'open': open_count, 'overdue': overdue, 'units': units}
+
+
+def borrowers():
+    return [r[0] for r in db.read("SELECT DISTINCT borrower FROM open_loans ORDER BY borrower")]
+
+
+OPEN_SQL = """SELECT o.loan_id, o.borrower, o.due, o.qty_open, l.out_ts, k.name,
+        (SELECT group_concat(i.name || ' x' || (ll.qty_out - ll.qty_returned), ', ') FROM loan_lines ll
+         JOIN items i ON i.id = ll.item_id WHERE ll.loan_id = o.loan_id AND ll.qty_returned < ll.qty_out)
+    FROM open_loans o JOIN loans l ON l.id = o.loan_id LEFT JOIN kits k ON k.id = l.kit_id"""
+OPEN_COLUMNS = ['Loan', 'Borrower', 'Due', 'Units Out', 'Out Since', 'Kit', 'Items']
+
+
+def currently_out(borrower=None):
+    if borrower:
+        return _frame(OPEN_SQL + " WHERE o.borrower = ? ORDER BY o.due", (borrower,))
+    return _frame(OPEN_SQL + " ORDER BY o.due")
+
+
+def overdue(today=None):
+    return _frame(OPEN_SQL + " WHERE o.due < ? ORDER BY o.due", (_due(today or date.today()),))
+
+
+def _frame(sql, params=()):
+    df = db.read_df(sql, params, columns=OPEN_COLUMNS)
+    df['Out Since'] = df['Out Since'].map(lambda ts: date.fromtimestamp(ts).isoformat())
+    df['Kit'] = df['Kit'].fillna("")
+    return df
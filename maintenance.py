@@ -0,0 +1,355 @@
+import glob
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import streamlit as st
+
+import db
+import perf
+
+# Backups are taken with SQLite's online backup API a few hundred pages per step, pausing
+# between steps, so the app's writers never wait on a copy; each snapshot is quick_check'ed
+# before it replaces anything and only the newest KEEP are kept. Compaction is
+# incremental_vacuum in short write transactions (databases created since v17 are
+# auto_vacuum=INCREMENTAL; older ones need one `compact --full`), and VACUUM INTO writes a
+# compacted snapshot without touching the live file. The scheduler only starts a run when
+# the app has been idle for IDLE_S. Every run is logged to maintenance_runs with its
+# duration and sizes.
+BACKUP_DIR = os.environ.get("ROBOLAB_BACKUP_DIR")   # default: backups/ next to the database
+KEEP = 7
+BACKUP_PAGES = 256         # pages copied per backup step
+STEP_PAUSE_S = 0.005       # between steps, so the app's threads get the GIL and the file
+MAX_RESTARTS = 3           # a write from another connection restarts a stepped backup
+VACUUM_PAGES = 512         # free pages released per incremental_vacuum transaction
+INTERVAL_S = 24 * 3600
+IDLE_S = 300
+CHECK_EVERY_S = 60
+PERF_RETAIN_DAYS = 90
+
+
+class BackupRestarted(Exception):
+    pass
+
+
+# --- SCHEMA ---
+def init_maintenance(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS maintenance_runs (id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL,
+        status TEXT NOT NULL, started_ts INTEGER NOT NULL, seconds REAL, db_bytes INTEGER, out_bytes INTEGER, path TEXT, detail TEXT)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_maintenance_runs_kind ON maintenance_runs(kind, status, started_ts)")
+
+
+# --- HELPERS ---
+def backup_dir():
+    return BACKUP_DIR or os.path.join(os.path.dirname(os.path.abspath(db.DB_FILE)), "backups")
+
+
+def db_bytes(path=None):
+    # The live size includes the WAL, which holds recent pages until the next checkpoint
+    path = path or db.DB_FILE
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+
+def snapshots(dest_dir=None):
+    # Rotated snapshots, newest first; pre-restore copies are not rotated
+    stem = os.path.splitext(os.path.basename(db.DB_FILE))[0]
+    paths = glob.glob(os.path.join(dest_dir or backup_dir(), f"{stem}-*.db"))
+    return sorted((p for p in paths if not p.endswith("-pre-restore.db")), key=os.path.getmtime, reverse=True)
+
+
+def _snapshot_path(dest_dir, suffix=""):
+    stem = os.path.splitext(os.path.basename(db.DB_FILE))[0]
+    base = os.path.join(dest_dir, f"{stem}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+    n, path = 1, f"{base}{suffix}.db"
+    while os.path.exists(path):
+        n += 1
+        path = f"{base}-{n}{suffix}.db"
+    return path
+
+
+def _check(conn, full=False):
+    problems = [r[0] for r in conn.execute("PRAGMA integrity_check" if full else "PRAGMA quick_check")]
+    return [] if problems == ["ok"] else problems
+
+
+def _log(kind, fn):
+    # Runs fn() -> (out_bytes, path, detail) and records it, failed or not
+    started, start = int(time.time()), time.perf_counter()
+    try:
+        out_bytes, path, detail = fn()
+    except Exception as e:
+        db.write("INSERT INTO maintenance_runs (kind, status, started_ts, seconds, db_bytes, detail) VALUES (?,?,?,?,?,?)",
+                 (kind, 'failed', started, round(time.perf_counter() - start, 3), db_bytes(), str(e) or type(e).__name__))
+        raise
+    seconds, size = round(time.perf_counter() - start, 3), db_bytes()
+    db.write("INSERT INTO maintenance_runs (kind, status, started_ts, seconds, db_bytes, out_bytes, path, detail) VALUES (?,?,?,?,?,?,?,?)",
+             (kind, 'done', started, seconds, size, out_bytes, path, detail))
+    return {'kind': kind, 'seconds': seconds, 'db_bytes': size, 'out_bytes': out_bytes, 'path': path, 'detail': detail}
+
+
+# --- BACKUP ---
+def _copy(src, dst, pages, progress=None):
+    seen = [None, 0]
+
+    def step(status, remaining, total):
+        # remaining going back up means another connection wrote and the copy started over
+        if seen[0] is not None and remaining > seen[0]:
+            seen[1] += 1
+            if seen[1] > MAX_RESTARTS:
+                raise BackupRestarted()
+        seen[0] = remaining
+        if progress:
+            progress(total - remaining, total, "Copying pages")
+        time.sleep(STEP_PAUSE_S)
+
+    try:
+        src.backup(dst, pages=pages, progress=step)
+    except BackupRestarted:
+        # Under steady writes, finish in one step: a single read transaction, which in WAL
+        # mode still does not block writers
+        src.backup(dst, pages=-1)
+    return seen[1]
+
+
+def _backup(dest_dir, keep, compact, progress, suffix=""):
+    dest_dir = dest_dir or backup_dir()
+    os.makedirs(dest_dir, exist_ok=True)
+    path = _snapshot_path(dest_dir, suffix)
+    part = path + ".part"
+    src = db._connect(db.DB_FILE)
+    try:
+        if compact:
+            src.execute("VACUUM INTO ?", (part,))
+            restarts = 0
+        else:
+            dst = sqlite3.connect(part)
+            try:
+                restarts = _copy(src, dst, BACKUP_PAGES, progress)
+            finally:
+                dst.close()
+    finally:
+        src.close()
+    check = sqlite3.connect(part)
+    try:
+        # The copy inherits the WAL flag; a snapshot should be one self-contained file
+        check.execute("PRAGMA journal_mode=DELETE")
+        problems = _check(check)
+    finally:
+        check.close()
+    if problems:
+        os.remove(part)
+        raise sqlite3.DatabaseError(f"Snapshot failed quick_check: {problems[0]}")
+    os.replace(part, path)
+    removed = rotate(dest_dir, keep) if keep else 0
+    detail = f"{'vacuum into' if compact else f'{BACKUP_PAGES} pages/step'}, {restarts} restarts, {removed} rotated out"
+    return os.path.getsize(path), path, detail
+
+
+@perf.traced('job', "backup")
+def backup(dest_dir=None, keep=KEEP, compact=False, progress=None):
+    # compact=True writes the snapshot with VACUUM INTO: smaller, and free of dead pages
+    return _log('backup', lambda: _backup(dest_dir, keep, compact, progress))
+
+
+def rotate(dest_dir=None, keep=KEEP):
+    removed = 0
+    for path in snapshots(dest_dir)[keep:]:
+        os.remove(path)
+        removed += 1
+    return removed
+
+
+# --- CHECKS ---
+@perf.traced('job', "quick check")
+def quick_check(full=False):
+    # A read transaction over the whole file; writers carry on in WAL mode
+    def run():
+        with db.connection() as conn:
+            problems = _check(conn, full)
+        if problems:
+            raise sqlite3.DatabaseError(f"{len(problems)} problems: {problems[0]}")
+        return None, None, "integrity_check ok" if full else "quick_check ok"
+    return _log('check', run)
+
+
+# --- COMPACTION ---
+def free_pages(conn):
+    return conn.execute("PRAGMA freelist_count").fetchone()[0], conn.execute("PRAGMA page_size").fetchone()[0]
+
+
+@perf.traced('job', "compact")
+def compact(full=False, progress=None):
+    # Incremental: releases free pages a few hundred at a time, each batch its own short
+    # write transaction. full=True switches the file to auto_vacuum=INCREMENTAL with a
+    # one-off VACUUM, which holds the write lock for its whole run; take the app down for it.
+    def run():
+        with db.connection() as conn:
+            free, page_size = free_pages(conn)
+            mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            if full:
+                before = os.path.getsize(db.DB_FILE)
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                conn.execute("VACUUM")
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                return before - os.path.getsize(db.DB_FILE), None, "full vacuum, auto_vacuum=INCREMENTAL"
+            if mode != 2:
+                return 0, None, "auto_vacuum is off; run `python maintenance.py compact --full` once"
+            left = free
+            while left:
+                # execute() steps this pragma once, which frees a single page; executescript runs it
+                # to completion as one autocommit write
+                conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES})")
+                left = free_pages(conn)[0]
+                if progress:
+                    progress(free - left, free, "Releasing free pages")
+                time.sleep(STEP_PAUSE_S)
+            # Hand the released pages back to the file system now rather than at the next auto-checkpoint
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return free * page_size, None, f"{free} pages released"
+    return _log('compact', run)
+
+
+def prune():
+    # Avatar thumbnails no user points at any more, and stored timings past retention
+    cutoff = int(time.time()) - PERF_RETAIN_DAYS * 86400
+    with db.transaction() as c:
+        blobs = c.execute("DELETE FROM avatar_blobs WHERE hash NOT IN (SELECT avatar_hash FROM users WHERE avatar_hash IS NOT NULL)").rowcount
+        metrics = c.execute("DELETE FROM perf_metrics WHERE ts < ?", (cutoff,)).rowcount
+    return None, None, f"{blobs} avatar blobs, {metrics} perf rows deleted"
+
+
+# --- RESTORE ---
+def restore(path, progress=None):
+    # Copies a snapshot over the live database through the backup API, so other open
+    # connections see the restored file rather than a half-replaced one. The current state is
+    # kept as a pre-restore snapshot first. Stop the app before running this.
+    src = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        problems = _check(src, full=True)
+        if problems:
+            raise sqlite3.DatabaseError(f"{path} failed integrity_check: {problems[0]}")
+        saved = _backup(None, 0, False, None, suffix="-pre-restore")[1]
+        start = time.perf_counter()
+        dst = db._connect(db.DB_FILE)
+        try:
+            src.backup(dst, pages=BACKUP_PAGES, progress=(lambda s, rem, tot: progress(tot - rem, tot, "Restoring")) if progress else None)
+        finally:
+            dst.close()
+    finally:
+        src.close()
+    import migrations
+    import sync
+    # A snapshot may predate later migrations
+    migrations.migrate()
+    # Changes made after the snapshot were already sent to other labs under sequence numbers
+    # this file will now hand out again; writing on under a fresh site id keeps them distinct
+    renamed = sync.new_site()
+    db.write("INSERT INTO maintenance_runs (kind, status, started_ts, seconds, db_bytes, out_bytes, path, detail) VALUES (?,?,?,?,?,?,?,?)",
+             ('restore', 'done', int(time.time()), round(time.perf_counter() - start, 3), db_bytes(), os.path.getsize(path), path,
+              f"previous state saved to {saved}; site id {renamed[0]} -> {renamed[1]}"))
+    return saved
+
+
+# --- SCHEDULER ---
+def last_run(kind):
+    return db.read_value("SELECT MAX(started_ts) FROM maintenance_runs WHERE kind = ? AND status = 'done'", (kind,), default=0)
+
+
+def idle(seconds=None):
+    # No transaction in this process, no background job and no stock movement for `seconds`
+    seconds = IDLE_S if seconds is None else seconds
+    now = time.time()
+    if any(e[2] == 'txn' and e[1] > now - seconds for e in perf.events()):
+        return False
+    if db.read_one("SELECT 1 FROM jobs WHERE status IN ('queued', 'running') LIMIT 1"):
+        return False
+    return db.read_value("SELECT ts FROM stock_moves ORDER BY id DESC LIMIT 1", default=0) < now - seconds
+
+
+def run_all(progress=None):
+    # The nightly run: snapshot, check, drop dead rows, give their pages back
+    return [backup(progress=progress), quick_check(), _log('prune', prune), compact(progress=progress)]
+
+
+class Scheduler:
+    def __init__(self, interval=INTERVAL_S, check_every=CHECK_EVERY_S):
+        self.interval = interval
+        self.check_every = check_every
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._loop, name="robolab-maintenance", daemon=True)
+        self.thread.start()
+
+    def due(self):
+        return time.time() - last_run('backup') >= self.interval
+
+    def _loop(self):
+        while not self._stop.wait(self.check_every):
+            try:
+                if self.due() and idle():
+                    run_all()
+            except Exception:
+                # Already logged to maintenance_runs; try again at the next idle window
+                pass
+
+    def stop(self):
+        self._stop.set()
+
+
+@st.cache_resource(show_spinner=False)
+def get_scheduler(db_file):
+    return Scheduler()
+
+
+# --- REPORTING ---
+def recent_runs(limit=50):
+    return db.read_df("""SELECT kind, status, datetime(started_ts, 'unixepoch', 'localtime'), seconds, db_bytes, out_bytes, path, detail
+        FROM maintenance_runs ORDER BY id DESC LIMIT ?""", (limit,),
+        columns=['Kind', 'Status', 'Started', 'Seconds', 'DB Bytes', 'Out Bytes', 'Path', 'Detail'])
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Back up, check, compact and restore the RoboLab database.")
+    parser.add_argument("--db", default=db.DB_FILE)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("backup", help="take a rotated online snapshot")
+    p.add_argument("--dir", help="snapshot directory (default: backups/ next to the database)")
+    p.add_argument("--keep", type=int, default=KEEP)
+    p.add_argument("--compact", action="store_true", help="write the snapshot with VACUUM INTO")
+    p = sub.add_parser("check", help="PRAGMA quick_check on the live database")
+    p.add_argument("--full", action="store_true", help="integrity_check instead")
+    p = sub.add_parser("compact", help="release free pages with incremental_vacuum")
+    p.add_argument("--full", action="store_true", help="one-off blocking VACUUM that enables incremental compaction")
+    sub.add_parser("run", help="backup, check, prune and compact, as the scheduler does")
+    p = sub.add_parser("restore", help="replace the live database with a snapshot (stop the app first)")
+    p.add_argument("snapshot")
+    p = sub.add_parser("list", help="snapshots and recent runs")
+    p.add_argument("--dir")
+    args = parser.parse_args()
+    db.DB_FILE = args.db
+
+    import migrations
+    migrations.migrate()
+
+    def show(r):
+        print(f"{r['kind']}: {r['seconds']:.2f}s, database {r['db_bytes']:,} bytes"
+              + (f", output {r['out_bytes']:,} bytes" if r['out_bytes'] is not None else "")
+              + (f" -> {r['path']}" if r['path'] else "") + f" ({r['detail']})")
+
+    if args.command == "backup":
+        show(backup(args.dir, args.keep, args.compact))
+    elif args.command == "check":
+        show(quick_check(args.full))
+    elif args.command == "compact":
+        show(compact(args.full))
+    elif args.command == "run":
+        for r in run_all():
+            show(r)
+    elif args.command == "restore":
+        print(f"restored {args.snapshot}; previous state saved to {restore(args.snapshot)}")
+    else:
+        for path in snapshots(args.dir):
+            print(f"{path}  {os.path.getsize(path):,} bytes")
+        print(recent_runs(20).to_string(index=False))
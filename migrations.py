@@ -0,0 +1,441 @@
+from datetime import datetime
+
+import streamlit as st
+
+import db
+
+# Each migration runs exactly once per database, in order, inside the same transaction that
+# records it in schema_migrations. Databases created before this table existed replay every
+# step, which is safe because the early steps are all IF NOT EXISTS / add-if-missing.
+# Online steps rewrite large tables in short batches and are resumable; run
+# `python migrations.py --dry-run` to see what is pending before touching a live database.
+
+
+def table_columns(c, table):
+    return [r[1] for r in c.execute(f"PRAGMA table_info({table})")]
+
+
+def add_column(c, table, column, decl):
+    if column not in table_columns(c, table):
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+# --- MIGRATIONS ---
+def m001_base_tables(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, category TEXT, quantity INTEGER, threshold INTEGER, location TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS transactions (id INTEGER PRIMARY KEY AUTOINCREMENT, item_id INTEGER, item_name TEXT, user TEXT, type TEXT, qty_change INTEGER, date TIMESTAMP, note TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS users (username TEXT PRIMARY KEY, password TEXT, role TEXT, employee_id TEXT, full_name TEXT, avatar TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS kits (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, description TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS kit_contents (id INTEGER PRIMARY KEY AUTOINCREMENT, kit_id INTEGER, item_id INTEGER, qty_needed INTEGER, FOREIGN KEY(kit_id) REFERENCES kits(id), FOREIGN KEY(item_id) REFERENCES items(id))''')
+
+
+def m002_user_profile_columns(c):
+    add_column(c, "users", "employee_id", "TEXT")
+    add_column(c, "users", "full_name", "TEXT")
+    add_column(c, "users", "avatar", "TEXT")
+
+
+def m003_default_admin(c):
+    from accounts import make_hashes
+    if not c.execute("SELECT 1 FROM users WHERE username = 'admin'").fetchone():
+        c.execute('INSERT INTO users (username, password, role, full_name, employee_id) VALUES (?,?,?,?,?)',
+                  ("admin", make_hashes("admin123"), "admin", "System Administrator", "ADM001"))
+
+
+def m004_report_indexes(c):
+    # Period range scans, per-item and per-user history
+    c.execute("CREATE INDEX IF NOT EXISTS idx_txn_date ON transactions(date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_txn_item_date ON transactions(item_id, date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_txn_user_date ON transactions(user, date)")
+
+
+def m005_export_log(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS exports (id INTEGER PRIMARY KEY AUTOINCREMENT, user TEXT, label TEXT, format TEXT, rows INTEGER, bytes INTEGER, seconds REAL, date TIMESTAMP)''')
+
+
+def m006_data_version(c):
+    # Bumped by any inventory write; keys the cached Dashboard aggregates
+    from dashboard import VERSIONED_TABLES
+    c.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+    c.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', 0)")
+    for table in VERSIONED_TABLES:
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            c.execute(f"CREATE TRIGGER IF NOT EXISTS bump_version_{table}_{event.lower()} AFTER {event} ON {table} "
+                      "BEGIN UPDATE meta SET value = value + 1 WHERE key = 'data_version'; END")
+
+
+def m007_reorder_queue(c):
+    # Trigger-maintained set of items at or below threshold, plus crossing history
+    queue_exists = c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reorder_queue'").fetchone()
+    c.execute("CREATE TABLE IF NOT EXISTS reorder_queue (item_id INTEGER PRIMARY KEY REFERENCES items(id), since TIMESTAMP)")
+    c.execute('''CREATE TABLE IF NOT EXISTS reorder_history (id INTEGER PRIMARY KEY AUTOINCREMENT, item_id INTEGER, event TEXT, quantity INTEGER, threshold INTEGER, date TIMESTAMP)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_reorder_history_item ON reorder_history(item_id, date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_items_low ON items(id) WHERE quantity <= threshold")
+    c.execute('''CREATE TRIGGER IF NOT EXISTS reorder_on_insert AFTER INSERT ON items WHEN NEW.quantity <= NEW.threshold BEGIN
+        INSERT OR IGNORE INTO reorder_queue (item_id, since) VALUES (NEW.id, datetime('now', 'localtime'));
+        INSERT INTO reorder_history (item_id, event, quantity, threshold, date) VALUES (NEW.id, 'LOW', NEW.quantity, NEW.threshold, datetime('now', 'localtime'));
+    END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS reorder_on_low AFTER UPDATE OF quantity, threshold ON items
+        WHEN NEW.quantity <= NEW.threshold AND NOT (OLD.quantity <= OLD.threshold) BEGIN
+        INSERT OR IGNORE INTO reorder_queue (item_id, since) VALUES (NEW.id, datetime('now', 'localtime'));
+        INSERT INTO reorder_history (item_id, event, quantity, threshold, date) VALUES (NEW.id, 'LOW', NEW.quantity, NEW.threshold, datetime('now', 'localtime'));
+    END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS reorder_on_cleared AFTER UPDATE OF quantity, threshold ON items
+        WHEN NOT (NEW.quantity <= NEW.threshold) AND OLD.quantity <= OLD.threshold BEGIN
+        DELETE FROM reorder_queue WHERE item_id = NEW.id;
+        INSERT INTO reorder_history (item_id, event, quantity, threshold, date) VALUES (NEW.id, 'CLEARED', NEW.quantity, NEW.threshold, datetime('now', 'localtime'));
+    END''')
+    c.execute("CREATE TRIGGER IF NOT EXISTS reorder_on_delete AFTER DELETE ON items BEGIN DELETE FROM reorder_queue WHERE item_id = OLD.id; END")
+    if not queue_exists:
+        c.execute("INSERT OR IGNORE INTO reorder_queue (item_id, since) SELECT id, datetime('now', 'localtime') FROM items WHERE quantity <= threshold")
+
+
+def m008_stock_ledger(c):
+    # Running balance on every transaction; an opening snapshot (txn_id 0) absorbs stock older than the log
+    signed = "CASE t.type WHEN 'OUT' THEN -t.qty_change ELSE t.qty_change END"
+    c.execute("CREATE TABLE IF NOT EXISTS stock_snapshots (item_id INTEGER, txn_id INTEGER, balance INTEGER, date TIMESTAMP, PRIMARY KEY (item_id, txn_id))")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_snapshots_date ON stock_snapshots(item_id, date)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_txn_item_seq ON transactions(item_id)")
+    if 'balance' not in table_columns(c, "transactions"):
+        c.execute("ALTER TABLE transactions ADD COLUMN balance INTEGER")
+        c.execute(f"""INSERT OR IGNORE INTO stock_snapshots (item_id, txn_id, balance, date)
+            SELECT i.id, 0, i.quantity - COALESCE((SELECT SUM({signed}) FROM transactions t WHERE t.item_id = i.id), 0), '0001-01-01 00:00:00'
+            FROM items i""")
+        c.execute(f"""WITH run AS (
+                SELECT t.id, SUM({signed}) OVER (PARTITION BY t.item_id ORDER BY t.id) AS total FROM transactions t
+            )
+            UPDATE transactions SET balance = run.total + COALESCE(
+                (SELECT s.balance FROM stock_snapshots s WHERE s.item_id = transactions.item_id AND s.txn_id = 0), 0)
+            FROM run WHERE run.id = transactions.id""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS ledger_balance AFTER INSERT ON transactions BEGIN
+        UPDATE transactions SET balance = COALESCE(
+            (SELECT p.balance FROM transactions p WHERE p.item_id = NEW.item_id AND p.id < NEW.id ORDER BY p.id DESC LIMIT 1),
+            (SELECT s.balance FROM stock_snapshots s WHERE s.item_id = NEW.item_id ORDER BY s.txn_id DESC LIMIT 1),
+            0) + CASE NEW.type WHEN 'OUT' THEN -NEW.qty_change ELSE NEW.qty_change END
+        WHERE id = NEW.id;
+    END""")
+
+
+def m009_search_index(c):
+    import search
+    search.init_search(c)
+
+
+def m010_avatar_store(c):
+    import avatars
+    avatars.init_avatars(c)
+
+
+# --- v11: NORMALIZED STOCK MOVES (online) ---
+# transactions (free-text item_name/user, TEXT dates) is rewritten into stock_moves with integer
+# foreign keys and epoch timestamps. Rows are copied in short batches so the app keeps writing while
+# it runs; the final cut-over copies the tail, swaps the legacy table for a compatibility view and
+# moves the balance trigger, all in one transaction. Progress is kept in meta so an interrupted run
+# resumes where it stopped.
+MOVES_BATCH = 5000
+LEGACY_TS = "COALESCE(CAST(strftime('%s', {col}, 'utc') AS INTEGER), 0)"
+
+
+def _legacy_transactions_is_table(c):
+    row = c.execute("SELECT type FROM sqlite_master WHERE name = 'transactions'").fetchone()
+    return row is not None and row[0] == 'table'
+
+
+def _moves_prepare(c):
+    # Integer user ids: users keeps its username key, id gets a unique index so it can be an FK parent
+    add_column(c, "users", "id", "INTEGER")
+    c.execute("UPDATE users SET id = rowid WHERE id IS NULL")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_id ON users(id)")
+    c.execute("CREATE TRIGGER IF NOT EXISTS users_assign_id AFTER INSERT ON users WHEN NEW.id IS NULL BEGIN UPDATE users SET id = NEW.rowid WHERE rowid = NEW.rowid; END")
+
+    c.execute('''CREATE TABLE IF NOT EXISTS stock_moves (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        item_id INTEGER NOT NULL REFERENCES items(id),
+        user_id INTEGER REFERENCES users(id),
+        type TEXT NOT NULL CHECK (type IN ('IN', 'OUT')),
+        qty_change INTEGER NOT NULL CHECK (qty_change >= 0),
+        ts INTEGER NOT NULL,
+        note TEXT,
+        balance INTEGER
+    )''')
+    # Covering indexes: period aggregates, per-item history/balances, per-user history
+    c.execute("CREATE INDEX IF NOT EXISTS idx_moves_ts ON stock_moves(ts, type, qty_change)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_moves_item_ts ON stock_moves(item_id, ts, balance)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_moves_item_seq ON stock_moves(item_id, id, balance)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_moves_user_ts ON stock_moves(user_id, ts)")
+
+    # Keep history that points at deleted items or users resolvable through the new keys
+    c.execute("""INSERT INTO items (id, name, category, quantity, threshold, location)
+        SELECT t.item_id, COALESCE(MAX(t.item_name), 'Item') || ' (archived #' || t.item_id || ')', 'Archived', 0, -1, ''
+        FROM transactions t LEFT JOIN items i ON i.id = t.item_id
+        WHERE t.item_id IS NOT NULL AND i.id IS NULL GROUP BY t.item_id""")
+    c.execute("""INSERT OR IGNORE INTO users (username, password, role, full_name)
+        SELECT DISTINCT t.user, NULL, 'archived', t.user FROM transactions t
+        WHERE t.user IS NOT NULL AND t.user NOT IN (SELECT username FROM users)""")
+    c.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('m011_copied_id', 0)")
+
+
+def _moves_copy_batch(c, limit):
+    last = c.execute("SELECT value FROM meta WHERE key = 'm011_copied_id'").fetchone()[0]
+    bound = c.execute("SELECT MAX(id) FROM (SELECT id FROM transactions WHERE id > ? ORDER BY id LIMIT ?)", (last, limit)).fetchone()[0]
+    if bound is None:
+        return 0
+    cur = c.execute(f"""INSERT INTO stock_moves (id, item_id, user_id, type, qty_change, ts, note, balance)
+        SELECT t.id, t.item_id, u.id, t.type, t.qty_change, {LEGACY_TS.format(col='t.date')}, t.note, t.balance
+        FROM transactions t LEFT JOIN users u ON u.username = t.user
+        WHERE t.id > ? AND t.id <= ? AND t.item_id IS NOT NULL""", (last, bound))
+    c.execute("UPDATE meta SET value = ? WHERE key = 'm011_copied_id'", (bound,))
+    return cur.rowcount
+
+
+def _moves_cutover(c):
+    while _moves_copy_batch(c, MOVES_BATCH):
+        pass
+    legacy = c.execute("SELECT count(*) FROM transactions WHERE item_id IS NOT NULL").fetchone()[0]
+    copied = c.execute("SELECT count(*) FROM stock_moves").fetchone()[0]
+    if copied < legacy:
+        raise RuntimeError(f"stock_moves has {copied} rows, legacy transactions has {legacy}; not cutting over")
+
+    c.execute("DROP TABLE transactions")
+    c.execute("""CREATE VIEW transactions AS
+        SELECT m.id, m.item_id, i.name AS item_name, u.username AS user, m.type, m.qty_change,
+               datetime(m.ts, 'unixepoch', 'localtime') AS date, m.note, m.balance
+        FROM stock_moves m LEFT JOIN items i ON i.id = m.item_id LEFT JOIN users u ON u.id = m.user_id""")
+    # Old-style INSERTs keep working against the view
+    c.execute("""CREATE TRIGGER transactions_insert INSTEAD OF INSERT ON transactions BEGIN
+        INSERT INTO stock_moves (item_id, user_id, type, qty_change, ts, note)
+        VALUES (NEW.item_id, (SELECT id FROM users WHERE username = NEW.user), NEW.type, NEW.qty_change,
+                COALESCE(CAST(strftime('%s', NEW.date, 'utc') AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER)), NEW.note);
+    END""")
+
+    # Snapshots move to epoch timestamps as well (opening snapshots sit at ts 0)
+    c.execute("CREATE TABLE stock_snapshots_v2 (item_id INTEGER NOT NULL, txn_id INTEGER NOT NULL, balance INTEGER NOT NULL, ts INTEGER NOT NULL, PRIMARY KEY (item_id, txn_id))")
+    c.execute(f"""INSERT INTO stock_snapshots_v2 (item_id, txn_id, balance, ts)
+        SELECT item_id, txn_id, balance, CASE WHEN txn_id = 0 THEN 0 ELSE {LEGACY_TS.format(col='date')} END FROM stock_snapshots""")
+    c.execute("DROP TABLE stock_snapshots")
+    c.execute("ALTER TABLE stock_snapshots_v2 RENAME TO stock_snapshots")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_snapshots_ts ON stock_snapshots(item_id, ts)")
+    # Archived placeholder items are pinned at zero after their last movement so they reconcile
+    c.execute("""INSERT OR IGNORE INTO stock_snapshots (item_id, txn_id, balance, ts)
+        SELECT m.item_id, MAX(m.id), 0, MAX(m.ts) FROM stock_moves m JOIN items i ON i.id = m.item_id
+        WHERE i.category = 'Archived' AND i.threshold = -1 GROUP BY m.item_id""")
+    import ledger
+    c.execute(ledger.BALANCE_TRIGGER)
+    c.execute("DELETE FROM meta WHERE key = 'm011_copied_id'")
+
+
+def m011_normalized_moves(dry_run=False, progress=None, batch_size=MOVES_BATCH):
+    with db.connection() as c:
+        if not _legacy_transactions_is_table(c):
+            return {'rows': 0}
+        stats = {
+            'rows': c.execute("SELECT count(*) FROM transactions").fetchone()[0],
+            'archived_items': c.execute("SELECT count(DISTINCT t.item_id) FROM transactions t LEFT JOIN items i ON i.id = t.item_id WHERE t.item_id IS NOT NULL AND i.id IS NULL").fetchone()[0],
+            'archived_users': c.execute("SELECT count(DISTINCT t.user) FROM transactions t WHERE t.user IS NOT NULL AND t.user NOT IN (SELECT username FROM users)").fetchone()[0],
+            'skipped_no_item': c.execute("SELECT count(*) FROM transactions WHERE item_id IS NULL").fetchone()[0],
+        }
+    if dry_run:
+        return stats
+
+    with db.transaction() as c:
+        _moves_prepare(c)
+    done = 0
+    while True:
+        with db.transaction() as c:
+            n = _moves_copy_batch(c, batch_size)
+        if not n:
+            break
+        done += n
+        if progress:
+            progress(11, "normalized stock moves", done, stats['rows'])
+    with db.transaction() as c:
+        _moves_cutover(c)
+    if progress:
+        progress(11, "normalized stock moves", stats['rows'], stats['rows'])
+    return stats
+
+
+def m012_perf_metrics(c):
+    # Flushed from perf's in-memory ring buffer on demand
+    c.execute("CREATE TABLE IF NOT EXISTS perf_metrics (id INTEGER PRIMARY KEY AUTOINCREMENT, ts INTEGER, kind TEXT, name TEXT, ms REAL, rows INTEGER, wait_ms REAL)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_perf_metrics_ts ON perf_metrics(ts)")
+
+
+def m013_jobs(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        label TEXT,
+        user TEXT,
+        status TEXT NOT NULL CHECK (status IN ('queued', 'running', 'done', 'failed')),
+        progress REAL,
+        message TEXT,
+        result TEXT,
+        error TEXT,
+        notified INTEGER NOT NULL DEFAULT 0,
+        created_ts INTEGER,
+        started_ts INTEGER,
+        finished_ts INTEGER
+    )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs(user, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_unnotified ON jobs(user) WHERE notified = 0")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_active ON jobs(user) WHERE status IN ('queued', 'running')")
+
+
+def m014_sync_log(c):
+    import sync
+    sync.init_sync(c)
+
+
+def m015_usage_rollups(c):
+    import forecast
+    # The rollup trigger skips loan moves, so the column has to exist before the trigger fires
+    add_column(c, "stock_moves", "loan_id", "INTEGER")
+    forecast.init_rollups(c)
+
+
+def m016_nested_kits(c):
+    import bom
+    import sync
+    bom.init_bom(c)
+    sync.init_sync(c)
+
+
+def m017_maintenance_log(c):
+    import maintenance
+    maintenance.init_maintenance(c)
+
+
+def m018_equipment_loans(c):
+    import loans
+    add_column(c, "items", "returnable", "INTEGER NOT NULL DEFAULT 0")
+    loans.init_loans(c)
+
+
+def m019_loan_moves(c):
+    # Lending and returns stop counting as usage: tag the moves already written by loans, rebuild
+    # the rollups without them and recompute today's forecasts
+    import forecast
+    add_column(c, "stock_moves", "loan_id", "INTEGER")
+    c.execute("""UPDATE stock_moves SET loan_id = (
+            SELECT l.id FROM loans l JOIN loan_lines ll ON ll.loan_id = l.id
+            WHERE ll.item_id = stock_moves.item_id AND l.out_ts = stock_moves.ts AND l.note IS stock_moves.note)
+        WHERE type = 'OUT' AND loan_id IS NULL AND ts >= (SELECT MIN(out_ts) FROM loans)""")
+    c.execute("""UPDATE stock_moves SET loan_id = CAST(substr(note, 7) AS INTEGER)
+        WHERE type = 'IN' AND loan_id IS NULL AND note LIKE 'Loan #% return' AND ts >= (SELECT MIN(out_ts) FROM loans)""")
+    # Period totals split loans out, so the covering index carries the tag
+    c.execute("DROP INDEX IF EXISTS idx_moves_ts")
+    c.execute("CREATE INDEX idx_moves_ts ON stock_moves(ts, type, qty_change, loan_id)")
+    c.execute("DROP TRIGGER IF EXISTS usage_rollup")
+    forecast.init_rollups(c)
+    forecast.refresh_forecasts(c)
+
+
+def m020_sync_version_seq(c):
+    # Same-site versions compare by seq; stamp the ones already held and re-create the capture
+    # triggers so they keep it
+    import sync
+    add_column(c, "sync_versions", "seq", "INTEGER")
+    c.execute("""UPDATE sync_versions SET seq = (SELECT MAX(l.seq) FROM change_log l
+        WHERE l.site = sync_versions.site AND l.tbl = sync_versions.tbl AND l.key = sync_versions.key AND l.ts = sync_versions.ts)
+        WHERE seq IS NULL""")
+    for trigger in sync.CAPTURED:
+        c.execute(f"DROP TRIGGER IF EXISTS {trigger[0]}")
+    sync.init_sync(c)
+
+
+def m021_job_owner(c):
+    # Which process runs each job, so only orphans of a dead process are failed on start-up
+    add_column(c, "jobs", "owner", "TEXT")
+
+
+# (version, name, step, online). Offline steps get a connection inside one transaction; online
+# steps manage their own batches and take (dry_run, progress).
+MIGRATIONS = [
+    (1, "base tables", m001_base_tables, False),
+    (2, "user profile columns", m002_user_profile_columns, False),
+    (3, "default admin", m003_default_admin, False),
+    (4, "report indexes", m004_report_indexes, False),
+    (5, "export log", m005_export_log, False),
+    (6, "data version", m006_data_version, False),
+    (7, "reorder queue", m007_reorder_queue, False),
+    (8, "stock ledger", m008_stock_ledger, False),
+    (9, "search index", m009_search_index, False),
+    (10, "avatar store", m010_avatar_store, False),
+    (11, "normalized stock moves", m011_normalized_moves, True),
+    (12, "perf metrics", m012_perf_metrics, False),
+    (13, "background jobs", m013_jobs, False),
+    (14, "sync change log", m014_sync_log, False),
+    (15, "usage rollups", m015_usage_rollups, False),
+    (16, "nested kits", m016_nested_kits, False),
+    (17, "maintenance log", m017_maintenance_log, False),
+    (18, "equipment loans", m018_equipment_loans, False),
+    (19, "loan moves", m019_loan_moves, False),
+    (20, "sync version seq", m020_sync_version_seq, False),
+    (21, "job owner", m021_job_owner, False),
+]
+
+
+# --- RUNNER ---
+def applied_versions(c):
+    c.execute("CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, name TEXT, applied_at TIMESTAMP)")
+    return {r[0] for r in c.execute("SELECT version FROM schema_migrations")}
+
+
+def _record(c, version, name):
+    c.execute("INSERT INTO schema_migrations (version, name, applied_at) VALUES (?,?,?)", (version, name, datetime.now()))
+
+
+def migrate(dry_run=False, progress=None):
+    # Returns [(version, name, report), ...] for the steps applied (or, with dry_run, pending)
+    with db.connection() as conn:
+        if dry_run:
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'schema_migrations'").fetchone()
+            done = {r[0] for r in conn.execute("SELECT version FROM schema_migrations")} if exists else set()
+        else:
+            done = applied_versions(conn)
+    applied = []
+    for version, name, step, online in MIGRATIONS:
+        if version in done:
+            continue
+        if dry_run:
+            applied.append((version, name, step(dry_run=True) if online else None))
+            continue
+        if online:
+            report = step(progress=progress)
+            with db.transaction() as c:
+                if not c.execute("SELECT 1 FROM schema_migrations WHERE version = ?", (version,)).fetchone():
+                    _record(c, version, name)
+        else:
+            with db.transaction() as c:
+                # Another process may have got here first
+                if c.execute("SELECT 1 FROM schema_migrations WHERE version = ?", (version,)).fetchone():
+                    continue
+                step(c)
+                _record(c, version, name)
+            report = None
+        if progress:
+            progress(version, name, 1, 1)
+        applied.append((version, name, report))
+    return applied
+
+
+@st.cache_resource(show_spinner=False)
+def ensure_schema(db_file):
+    # Once per process per database file, not once per rerun
+    return migrate()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations to the RoboLab database.")
+    parser.add_argument("--db", default=db.DB_FILE)
+    parser.add_argument("--dry-run", action="store_true", help="list pending migrations and what they would touch")
+    args = parser.parse_args()
+    db.DB_FILE = args.db
+
+    def report(version, name, done, total):
+        print(f"  v{version} {name}: {done}/{total}")
+
+    for version, name, detail in migrate(dry_run=args.dry_run, progress=None if args.dry_run else report):
+        print(f"{'pending' if args.dry_run else 'applied'} v{version} {name}" + (f" {detail}" if detail else ""))
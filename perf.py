@@ -0,0 +1,130 @@
+import functools
+import io
+import itertools
+import os
+import re
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+import streamlit as st
+
+# Process-wide ring buffer of timing events; appends are O(1) and never block, so the hot
+# path pays two perf_counter() calls. Set ROBOLAB_PERF=0 to switch recording off.
+ENABLED = os.environ.get("ROBOLAB_PERF", "1") != "0"
+RING_SIZE = 5000
+EVENT_FIELDS = ('seq', 'ts', 'kind', 'name', 'ms', 'rows', 'wait_ms')
+
+_events = deque(maxlen=RING_SIZE)
+_seq = itertools.count(1)
+_flushed = 0
+cache_calls = Counter()
+cache_misses = Counter()
+
+
+def record(kind, name, ms, rows=None, wait_ms=None):
+    if ENABLED:
+        _events.append((next(_seq), time.time(), kind, name, round(ms, 3), rows, None if wait_ms is None else round(wait_ms, 3)))
+
+
+def query_name(sql):
+    # Collapses whitespace so the same statement groups together in the panel
+    return re.sub(r"\s+", " ", sql).strip()[:160]
+
+
+@contextmanager
+def timed(kind, name):
+    # The yielded dict may carry 'rows' / 'wait_ms' back to the recorded event
+    info = {}
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        record(kind, name, (time.perf_counter() - start) * 1000, info.get('rows'), info.get('wait_ms'))
+
+
+def traced(kind, name=None):
+    def wrap(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            with timed(kind, label):
+                return fn(*args, **kwargs)
+        return call
+    return wrap
+
+
+def events():
+    return list(_events)
+
+
+def reset():
+    global _flushed
+    _events.clear()
+    cache_calls.clear()
+    cache_misses.clear()
+    _flushed = 0
+
+
+# --- CACHE HIT RATES ---
+def cache_data(**kwargs):
+    # Drop-in for st.cache_data that counts calls and misses (the body only runs on a miss)
+    def wrap(fn):
+        name = fn.__qualname__
+
+        @functools.wraps(fn)
+        def miss(*args, **kw):
+            cache_misses[name] += 1
+            return fn(*args, **kw)
+
+        cached = st.cache_data(**kwargs)(miss)
+
+        @functools.wraps(fn)
+        def call(*args, **kw):
+            cache_calls[name] += 1
+            return cached(*args, **kw)
+        call.clear = cached.clear
+        return call
+    return wrap
+
+
+def cache_stats():
+    return [(name, calls, calls - cache_misses[name], (calls - cache_misses[name]) / calls if calls else 0.0)
+            for name, calls in cache_calls.most_common()]
+
+
+# --- PERSISTENCE ---
+def flush():
+    # Appends events recorded since the last flush to perf_metrics; returns how many
+    global _flushed
+    import db
+    pending = [e for e in events() if e[0] > _flushed]
+    if not pending:
+        return 0
+    ok = db.write_many("INSERT INTO perf_metrics (ts, kind, name, ms, rows, wait_ms) VALUES (?,?,?,?,?,?)",
+                       [(int(e[1]), e[2], e[3], e[4], e[5], e[6]) for e in pending])
+    if ok:
+        _flushed = pending[-1][0]
+    return len(pending) if ok else 0
+
+
+# --- PROFILING ---
+@contextmanager
+def profile(enabled=True, limit=40):
+    # Yields a dict that holds the cumulative-time report once the block exits, however it exits
+    result = {}
+    if not enabled:
+        yield result
+        return
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield result
+    finally:
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).strip_dirs().sort_stats("cumulative").print_stats(limit)
+        result['report'] = out.getvalue()
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+import bom
+import db
+import perf
+
+
+# --- KIT x ITEM MATRIX ---
+@perf.cache_data(show_spinner=False, max_entries=4)
+def load_matrix(version):
+    # Returns (kit ids, kit names, item ids, item names, requirement matrix [kits x items], stock vector)
+    kits = db.read("SELECT id, name FROM kits ORDER BY id")
+    items = db.read("SELECT id, name, quantity FROM items ORDER BY id")
+    # Nested kits arrive already multiplied out
+    lines = [(kit_id, item_id, qty) for kit_id, items in bom.explosion(bom.kit_version()).items() for item_id, qty in items.items()]
+
+    kit_ids = np.array([k[0] for k in kits], dtype=np.int64)
+    item_ids = np.array([i[0] for i in items], dtype=np.int64)
+    stock = np.array([max(i[2] or 0, 0) for i in items], dtype=np.int64)
+    req = np.zeros((len(kits), len(items)), dtype=np.int64)
+    if lines:
+        line_arr = np.array(lines, dtype=np.int64)
+        k_idx = np.searchsorted(kit_ids, line_arr[:, 0])
+        i_idx = np.searchsorted(item_ids, line_arr[:, 1])
+        # Drop lines pointing at deleted kits or items
+        ok = (k_idx < len(kit_ids)) & (i_idx < len(item_ids))
+        ok[ok] &= (kit_ids[k_idx[ok]] == line_arr[ok, 0]) & (item_ids[i_idx[ok]] == line_arr[ok, 1])
+        np.add.at(req, (k_idx[ok], i_idx[ok]), line_arr[ok, 2])
+    return kit_ids, [k[1] for k in kits], item_ids, [i[1] for i in items], req, stock
+
+
+# --- CAPACITY ---
+def max_buildable(req, stock):
+    # Per kit, the scarcest component decides: min over its items of stock // qty_needed
+    per_item = np.where(req > 0, stock[np.newaxis, :] // np.maximum(req, 1), np.iinfo(np.int64).max)
+    caps = per_item.min(axis=1, initial=np.iinfo(np.int64).max)
+    caps[~(req > 0).any(axis=1)] = 0  # empty kits build nothing
+    return caps
+
+
+def allocate(req, stock, requested):
+    # Largest integer allocation <= requested that fits shared stock: scale the whole mix down
+    # by binary search, then top up kit by kit while stock allows.
+    requested = np.asarray(requested, dtype=np.int64)
+    if np.all(req.T @ requested <= stock):
+        return requested.copy()
+
+    def fits(alloc):
+        return np.all(req.T @ alloc <= stock)
+
+    lo, hi = 0.0, 1.0
+    for _ in range(30):
+        mid = (lo + hi) / 2
+        if fits(np.floor(requested * mid).astype(np.int64)):
+            lo = mid
+        else:
+            hi = mid
+    alloc = np.floor(requested * lo).astype(np.int64)
+
+    remaining = stock - req.T @ alloc
+    # Top up the kits furthest from their target first, each by as many as stock still allows
+    for k in np.argsort(alloc - requested):
+        needs = req[k] > 0
+        if alloc[k] >= requested[k] or not needs.any():
+            continue
+        extra = min(requested[k] - alloc[k], int((remaining[needs] // req[k, needs]).min()))
+        if extra > 0:
+            alloc[k] += extra
+            remaining -= req[k] * extra
+    return alloc
+
+
+def bottlenecks(req, stock, requested, item_names):
+    # Components whose demand for the requested mix exceeds stock, worst first
+    demand = req.T @ np.asarray(requested, dtype=np.int64)
+    short = np.flatnonzero(demand > stock)
+    users = (req[:, short] > 0) & (np.asarray(requested)[:, np.newaxis] > 0)
+    df = pd.DataFrame({
+        'Component': [item_names[i] for i in short],
+        'Required': demand[short],
+        'In Stock': stock[short],
+        'Short By': demand[short] - stock[short],
+        'Kits Using': users.sum(axis=0),
+    })
+    return df.sort_values('Short By', ascending=False, ignore_index=True)
+
+
+def plan(version, requested_by_name):
+    kit_ids, kit_names, item_ids, item_names, req, stock = load_matrix(version)
+    requested = np.array([int(requested_by_name.get(n, 0)) for n in kit_names], dtype=np.int64)
+    alloc = allocate(req, stock, requested)
+    summary = pd.DataFrame({
+        'Kit': kit_names,
+        'Max Buildable (alone)': max_buildable(req, stock),
+        'Requested': requested,
+        'Allocated': alloc,
+    })
+    return summary, bottlenecks(req, stock, requested, item_names)
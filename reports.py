@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import db
+import ledger
+
+PERIODS = {
+    "All Time": None,
+    "Monthly (Last 30 Days)": 30,
+    "Quarterly (Last 90 Days)": 90,
+    "Half Yearly (Last 180 Days)": 180,
+    "Yearly (Last 365 Days)": 365,
+}
+
+REPORT_COLUMNS = ['ID', 'Item ID', 'Item', 'User', 'Type', 'Qty', 'Date', 'Note']
+# stock_moves carries integer keys and epoch timestamps; names and local dates are joined in for display
+REPORT_FROM = " FROM stock_moves m LEFT JOIN items i ON i.id = m.item_id LEFT JOIN users u ON u.id = m.user_id"
+REPORT_FIELDS = "m.id, m.item_id, i.name, u.username, m.type, m.qty_change, datetime(m.ts, 'unixepoch', 'localtime'), m.note"
+REPORT_SELECT = f"SELECT {REPORT_FIELDS}{REPORT_FROM}"
+
+
+# --- FILTERS ---
+def period_start(period, now=None):
+    days = PERIODS.get(period)
+    if days is None:
+        return None
+    return (now or datetime.now()) - timedelta(days=days)
+
+
+def build_filters(period="All Time", item_id=None, user=None, txn_type=None):
+    # Returns (where_sql, params) over stock_moves m; every predicate is served by an index
+    clauses, params = [], []
+    start = period_start(period)
+    if start is not None:
+        clauses.append("m.ts >= ?")
+        params.append(ledger.epoch(start))
+    if item_id is not None:
+        clauses.append("m.item_id = ?")
+        params.append(item_id)
+    if user:
+        clauses.append("m.user_id = (SELECT id FROM users WHERE username = ?)")
+        params.append(user)
+    if txn_type:
+        clauses.append("m.type = ?")
+        params.append(txn_type)
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    return where, params
+
+
+# --- AGGREGATES ---
+def summarize(where, params):
+    # Loan moves are counted apart: lending is not consumption and a return is not a restock
+    totals = {'IN': 0, 'OUT': 0, 'LENT': 0, 'RETURNED': 0, 'rows': 0}
+    loan_keys = {'OUT': 'LENT', 'IN': 'RETURNED'}
+    for txn_type, on_loan, qty, n in db.read(f"""SELECT m.type, m.loan_id IS NOT NULL, COALESCE(SUM(m.qty_change), 0), COUNT(*)
+            FROM stock_moves m{where} GROUP BY m.type, m.loan_id IS NOT NULL""", params):
+        totals[loan_keys[txn_type] if on_loan else txn_type] += qty
+        totals['rows'] += n
+    return totals
+
+
+# --- KEYSET PAGINATION ---
+def fetch_page(where, params, after=None, limit=50):
+    # after: (ts, id) of the last row on the previous page, newest first.
+    # Returns (rows, cursor for the next page)
+    sql, args = f"SELECT {REPORT_FIELDS}, m.ts{REPORT_FROM}{where}", list(params)
+    if after is not None:
+        sql += (" AND " if where else " WHERE ") + "(m.ts, m.id) < (?, ?)"
+        args.extend(after)
+    sql += " ORDER BY m.ts DESC, m.id DESC LIMIT ?"
+    args.append(limit)
+    rows = db.read(sql, args)
+    cursor = (rows[-1][-1], rows[-1][0]) if rows else None
+    return [r[:-1] for r in rows], cursor
@@ -0,0 +1,120 @@
+import re
+
+import db
+import inventory
+import perf
+import search
+
+# Scan batches: one line per scan or per pasted row, "<code> [qty]". A code is the item name,
+# its punctuation-insensitive form ("hcsr04" for "HC-SR04") or "#<item id>" as printed on
+# labels. qty defaults to 1 in the batch direction; a signed qty ("+5", "-2") overrides it.
+# Names are resolved against an in-memory map, so a whole batch costs no per-line queries.
+QTY_RE = re.compile(r"^(?:[x*]\s*)?([+-]?\d+)$", re.I)
+SPLIT_RE = re.compile(r"^(.*?)(?:\s*[,;\t]\s*|\s+)((?:[x*]\s*)?[+-]?\d+)$", re.I)
+MAX_QTY = 100_000
+
+
+def catalogue_key():
+    # Changes whenever an item is added or removed; stock movements leave it alone
+    return tuple(db.read_one("SELECT count(*), COALESCE(MAX(id), 0) FROM items"))
+
+
+@perf.cache_data(show_spinner=False, max_entries=4)
+def lookup_map(key):
+    # Returns (exact lower-cased name -> (id, name), normalized name -> (id, name), id -> name).
+    # Normalized keys shared by two items are dropped so a loose scan never picks the wrong one.
+    exact, loose, by_id, clashes = {}, {}, {}, set()
+    for item_id, name in db.read("SELECT id, name FROM items WHERE name IS NOT NULL AND threshold >= 0"):
+        exact[name.strip().lower()] = (item_id, name)
+        by_id[item_id] = name
+        key_ = search.normalize(name)
+        if key_ in loose and loose[key_][0] != item_id:
+            clashes.add(key_)
+        loose[key_] = (item_id, name)
+    for key_ in clashes:
+        del loose[key_]
+    return exact, loose, by_id
+
+
+def resolve(code, maps):
+    exact, loose, by_id = maps
+    code = code.strip()
+    if code.startswith("#") and code[1:].isdigit():
+        item_id = int(code[1:])
+        return (item_id, by_id[item_id]) if item_id in by_id else None
+    return exact.get(code.lower()) or loose.get(search.normalize(code))
+
+
+def parse(text, direction="OUT", maps=None):
+    # Returns ([(line_no, item_id, name, signed qty), ...], [(line_no, line, reason), ...])
+    maps = maps or lookup_map(catalogue_key())
+    sign = -1 if direction == "OUT" else 1
+    entries, errors = [], []
+    for line_no, raw in enumerate(text.splitlines(), 1):
+        line = raw.strip()
+        if not line or line.startswith("//"):
+            continue
+        # A whole-line match wins, so names ending in a number ("Resistor 220") still scan
+        hit, qty = resolve(line, maps), None
+        if hit is None and (m := SPLIT_RE.match(line)):
+            hit, qty = resolve(m.group(1), maps), QTY_RE.match(m.group(2)).group(1)
+        if hit is None:
+            errors.append((line_no, line, "unknown item"))
+            continue
+        n = sign if qty is None else (int(qty) if qty[0] in "+-" else sign * int(qty))
+        if n == 0 or abs(n) > MAX_QTY:
+            errors.append((line_no, line, "bad quantity"))
+            continue
+        entries.append((line_no, hit[0], hit[1], n))
+    return entries, errors
+
+
+# --- CART ---
+def add_to_cart(cart, entries):
+    # cart: {item_id: [name, signed qty]}; repeated scans of one item accumulate, and lines
+    # that net to zero drop out
+    for _, item_id, name, n in entries:
+        line = cart.setdefault(item_id, [name, 0])
+        line[1] += n
+        if not line[1]:
+            del cart[item_id]
+    return cart
+
+
+def commit_cart(cart, user, note=None):
+    return inventory.apply_batch({item_id: qty for item_id, (_, qty) in cart.items()}, user, note)
+
+
+@perf.traced('import', "scan batch")
+def ingest(text, user, direction="OUT", note=None, dry_run=False):
+    # Headless entry point: parse, resolve and commit one batch; unknown lines abort nothing
+    # but are reported, shortages abort the whole batch (InsufficientStock)
+    entries, errors = parse(text, direction)
+    cart = add_to_cart({}, entries)
+    moved = 0 if dry_run else commit_cart(cart, user, note)
+    return {'lines': len(entries) + len(errors), 'items': len(cart), 'moved': moved, 'errors': errors}
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description="Check a batch of scanned items in or out of the RoboLab inventory.")
+    parser.add_argument("file", help="one '<code> [qty]' per line; - reads stdin")
+    parser.add_argument("--user", required=True)
+    parser.add_argument("--direction", choices=["IN", "OUT"], default="OUT")
+    parser.add_argument("--note")
+    parser.add_argument("--db", default=db.DB_FILE)
+    parser.add_argument("--dry-run", action="store_true", help="resolve and report without committing")
+    args = parser.parse_args()
+    db.DB_FILE = args.db
+
+    import migrations
+    migrations.migrate()
+    text = sys.stdin.read() if args.file == "-" else open(args.file, encoding="utf-8").read()
+    try:
+        result = ingest(text, args.user, args.direction, args.note, args.dry_run)
+    except inventory.InsufficientStock as e:
+        sys.exit(f"Batch not committed, insufficient stock: {e}")
+    for line_no, line, reason in result['errors']:
+        print(f"line {line_no}: {reason}: {line}")
+    print(f"{'would move' if args.dry_run else 'moved'} {result['items']} items from {result['lines']} lines")
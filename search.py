@@ -0,0 +1,82 @@
+import re
+import sqlite3
+from difflib import SequenceMatcher
+
+import db
+
+# Punctuation-insensitive key, so "HC-SR04", "HC SR04" and "hcsr04" index the same trigrams
+NORMALIZE_SQL = "lower(replace(replace(replace(replace(replace({col}, '-', ''), ' ', ''), '_', ''), '.', ''), '/', ''))"
+CANDIDATES = 200
+TOP_K = 20
+
+
+def normalize(text):
+    return re.sub(r'[^0-9a-z]', '', str(text).lower())
+
+
+# --- INDEX ---
+def init_search(c):
+    # FTS5 trigram index over items, kept in step by triggers; skipped if SQLite lacks FTS5
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE name = 'items_fts'").fetchone()
+    try:
+        c.execute("CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(key, name, category, location, tokenize='trigram')")
+    except sqlite3.OperationalError:
+        return False
+    key = NORMALIZE_SQL.format(col="NEW.name")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN
+        INSERT INTO items_fts (rowid, key, name, category, location) VALUES (NEW.id, {key}, NEW.name, NEW.category, NEW.location);
+    END""")
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS items_fts_update AFTER UPDATE OF name, category, location ON items BEGIN
+        DELETE FROM items_fts WHERE rowid = OLD.id;
+        INSERT INTO items_fts (rowid, key, name, category, location) VALUES (NEW.id, {key}, NEW.name, NEW.category, NEW.location);
+    END""")
+    c.execute("CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN DELETE FROM items_fts WHERE rowid = OLD.id; END")
+    if not exists:
+        c.execute(f"INSERT INTO items_fts (rowid, key, name, category, location) SELECT id, {NORMALIZE_SQL.format(col='name')}, name, category, location FROM items")
+    return True
+
+
+# --- QUERY ---
+def _match_expression(query):
+    # Any trigram of the normalized query, or any plain word, may match; ranking sorts it out
+    key = normalize(query)
+    terms = {key[i:i + 3] for i in range(len(key) - 2)}
+    terms.update(w for w in re.findall(r'\w+', query.lower()) if len(w) >= 3)
+    return " OR ".join('"' + t.replace('"', '""') + '"' for t in sorted(terms))
+
+
+def _score(row, query_key):
+    name_key = normalize(row[1])
+    score = SequenceMatcher(None, query_key, name_key).ratio()
+    if query_key in name_key:
+        score += 1.0 if name_key.startswith(query_key) else 0.5
+    elif query_key in normalize(row[2]) or query_key in normalize(row[3]):
+        score += 0.3
+    return score
+
+
+def search_items(query, k=TOP_K):
+    # Returns [(id, name, category, location, quantity), ...] best match first
+    query = (query or "").strip()
+    if not query:
+        return db.read("SELECT id, name, category, location, quantity FROM items ORDER BY name LIMIT ?", (k,))
+    query_key = normalize(query)
+    rows = []
+    if len(query_key) >= 3:
+        try:
+            rows = db.read(
+                """SELECT i.id, i.name, i.category, i.location, i.quantity FROM items_fts f JOIN items i ON i.id = f.rowid
+                   WHERE items_fts MATCH ? ORDER BY f.rank LIMIT ?""",
+                (_match_expression(query), CANDIDATES),
+            )
+        except sqlite3.OperationalError:
+            rows = []
+    if not rows:
+        # Short queries (below one trigram) or no FTS5: plain substring match
+        like = f"%{query}%"
+        rows = db.read(
+            "SELECT id, name, category, location, quantity FROM items WHERE name LIKE ? OR category LIKE ? OR location LIKE ? LIMIT ?",
+            (like, like, like, CANDIDATES),
+        )
+    rows.sort(key=lambda r: _score(r, query_key), reverse=True)
+    return rows[:k]
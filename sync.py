@@ -0,0 +1,366 @@
+import gzip
+import json
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+
+import bom
+import db
+
+# Multi-lab replication. Triggers append every change to items, kits, kit lines and
+# stock_moves to change_log under this site's id and the next per-site sequence number; a
+# bundle carries the rows a peer has not seen yet, so export and import cost follows the
+# number of changes, not the size of the database. Rows travel by natural key (item and kit
+# names) because integer ids are local to each database.
+#
+# Catalogue rows (items, kits, kit_contents, kit_children) are last-writer-wins registers ordered by
+# (ts, site) across sites and by seq within one, so a site's later change always replaces its
+# earlier one whatever its clock says; when a remote write meets a different local value from
+# another site the outcome is logged to sync_conflicts. Stock is physical and per-lab: remote movements land
+# in remote_moves and never touch the local items.quantity or ledger.
+BUNDLE_FORMAT = 1
+NOW_MS = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+SITE = "(SELECT value FROM meta WHERE key = 'site_id')"
+# Set inside the applying transaction so remote rows are not logged a second time as local ones
+LOGGING = "COALESCE((SELECT value FROM meta WHERE key = 'sync_applying'), 0) = 0"
+KEY_SEP = "\x1f"
+PAIR_KEY = "(SELECT name FROM kits WHERE id = {row}.kit_id) || char(31) || (SELECT name FROM items WHERE id = {row}.item_id)"
+PAIR_QTY = "json_object('qty', (SELECT COALESCE(SUM(qty_needed), 0) FROM kit_contents WHERE kit_id = {row}.kit_id AND item_id = {row}.item_id))"
+CHILD_KEY = "(SELECT name FROM kits WHERE id = {row}.kit_id) || char(31) || (SELECT name FROM kits WHERE id = {row}.child_kit_id)"
+CHILD_QTY = "json_object('qty', COALESCE((SELECT qty_needed FROM kit_children WHERE kit_id = {row}.kit_id AND child_kit_id = {row}.child_kit_id), 0))"
+# Kit line tables: (table the line points at, its column)
+LINES = {'kit_contents': ("items", "item_id"), 'kit_children': ("kits", "child_kit_id")}
+MOVE_DATA = """json_object('item', (SELECT name FROM items WHERE id = NEW.item_id), 'user', (SELECT username FROM users WHERE id = NEW.user_id),
+        'type', NEW.type, 'qty', NEW.qty_change, 'ts', NEW.ts, 'note', NEW.note, 'balance', NEW.balance)"""
+
+# (trigger, event, table, op, key, data, when)
+CAPTURED = (
+    ("items_sync_insert", "INSERT", "items", "upsert", "NEW.name",
+     "json_object('category', NEW.category, 'threshold', NEW.threshold, 'location', NEW.location)", ""),
+    ("items_sync_update", "UPDATE OF name, category, threshold", "items", "upsert", "NEW.name",
+     "json_object('category', NEW.category, 'threshold', NEW.threshold, 'location', NEW.location)",
+     " AND (OLD.name IS NOT NEW.name OR OLD.category IS NOT NEW.category OR OLD.threshold IS NOT NEW.threshold)"),
+    ("items_sync_rename", "UPDATE OF name", "items", "delete", "OLD.name", "NULL", " AND OLD.name IS NOT NEW.name"),
+    ("items_sync_delete", "DELETE", "items", "delete", "OLD.name", "NULL", ""),
+    ("kits_sync_insert", "INSERT", "kits", "upsert", "NEW.name", "json_object('description', NEW.description)", ""),
+    ("kits_sync_update", "UPDATE OF name, description", "kits", "upsert", "NEW.name", "json_object('description', NEW.description)",
+     " AND (OLD.name IS NOT NEW.name OR OLD.description IS NOT NEW.description)"),
+    ("kits_sync_rename", "UPDATE OF name", "kits", "delete", "OLD.name", "NULL", " AND OLD.name IS NOT NEW.name"),
+    ("kits_sync_delete", "DELETE", "kits", "delete", "OLD.name", "NULL", ""),
+    # A kit line is the total qty of one item in one kit; 0 means the line is gone
+    ("kit_contents_sync_insert", "INSERT", "kit_contents", "upsert", PAIR_KEY.format(row="NEW"), PAIR_QTY.format(row="NEW"), ""),
+    ("kit_contents_sync_update", "UPDATE OF qty_needed", "kit_contents", "upsert", PAIR_KEY.format(row="NEW"), PAIR_QTY.format(row="NEW"), ""),
+    ("kit_contents_sync_delete", "DELETE", "kit_contents", "upsert", PAIR_KEY.format(row="OLD"), PAIR_QTY.format(row="OLD"), ""),
+    ("kit_children_sync_insert", "INSERT", "kit_children", "upsert", CHILD_KEY.format(row="NEW"), CHILD_QTY.format(row="NEW"), ""),
+    ("kit_children_sync_update", "UPDATE OF qty_needed", "kit_children", "upsert", CHILD_KEY.format(row="NEW"), CHILD_QTY.format(row="NEW"), ""),
+    ("kit_children_sync_delete", "DELETE", "kit_children", "upsert", CHILD_KEY.format(row="OLD"), CHILD_QTY.format(row="OLD"), ""),
+    # Captured when ledger_balance fills in the running balance, which happens once per new move
+    ("stock_moves_sync_insert", "UPDATE OF balance", "stock_moves", "move", f"{SITE} || ':' || NEW.id", MOVE_DATA, " AND OLD.balance IS NULL"),
+)
+
+
+def _capture_trigger(name, event, table, op, key, data, when):
+    # Registers (everything but moves) also record the version they overwrite and stamp
+    # sync_versions, the per-key LWW clock
+    prev = "NULL" if op == "move" else f"(SELECT v.ts || '@' || v.site FROM sync_versions v WHERE v.tbl = '{table}' AND v.key = {key})"
+    version = "" if op == "move" else f"""
+    INSERT INTO sync_versions (tbl, key, ts, site, seq) SELECT l.tbl, l.key, l.ts, l.site, l.seq FROM change_log l
+        WHERE l.site = {SITE} AND l.seq = (SELECT seq FROM sync_sites WHERE site = {SITE})
+        ON CONFLICT (tbl, key) DO UPDATE SET ts = excluded.ts, site = excluded.site, seq = excluded.seq;"""
+    return f"""CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table} WHEN {LOGGING}{when} BEGIN
+    UPDATE sync_sites SET seq = seq + 1 WHERE site = {SITE};
+    INSERT INTO change_log (site, seq, tbl, op, key, data, ts, prev)
+        SELECT s.site, s.seq, '{table}', '{op}', {key}, {data}, {NOW_MS}, {prev} FROM sync_sites s WHERE s.site = {SITE};{version}
+END"""
+
+
+def new_site_id():
+    return f"site-{uuid.uuid4().hex[:8]}"
+
+
+# --- SCHEMA ---
+def init_sync(c, site_id=None):
+    c.execute('''CREATE TABLE IF NOT EXISTS change_log (
+        site TEXT NOT NULL, seq INTEGER NOT NULL, tbl TEXT NOT NULL, op TEXT NOT NULL,
+        key TEXT NOT NULL, data TEXT, ts INTEGER NOT NULL, prev TEXT, PRIMARY KEY (site, seq)) WITHOUT ROWID''')
+    # Highest seq held locally per origin site: this database's version vector
+    c.execute("CREATE TABLE IF NOT EXISTS sync_sites (site TEXT PRIMARY KEY, seq INTEGER NOT NULL DEFAULT 0)")
+    # What each peer had of each origin when it last sent us a bundle
+    c.execute('''CREATE TABLE IF NOT EXISTS sync_peers (peer TEXT NOT NULL, site TEXT NOT NULL, seq INTEGER NOT NULL,
+        synced_ts INTEGER, PRIMARY KEY (peer, site)) WITHOUT ROWID''')
+    c.execute("CREATE TABLE IF NOT EXISTS sync_versions (tbl TEXT NOT NULL, key TEXT NOT NULL, ts INTEGER NOT NULL, site TEXT NOT NULL, seq INTEGER, PRIMARY KEY (tbl, key)) WITHOUT ROWID")
+    c.execute('''CREATE TABLE IF NOT EXISTS sync_conflicts (id INTEGER PRIMARY KEY AUTOINCREMENT, tbl TEXT, key TEXT,
+        local TEXT, remote TEXT, remote_site TEXT, winner TEXT, reason TEXT, ts INTEGER)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS remote_moves (site TEXT NOT NULL, origin_id INTEGER NOT NULL, item TEXT, username TEXT,
+        type TEXT, qty_change INTEGER, ts INTEGER, note TEXT, balance INTEGER, PRIMARY KEY (site, origin_id)) WITHOUT ROWID''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_remote_moves_item ON remote_moves(item, site, ts)")
+
+    fresh = c.execute("SELECT 1 FROM meta WHERE key = 'site_id'").fetchone() is None
+    c.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('site_id', ?)", (site_id or new_site_id(),))
+    c.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('sync_applying', 0)")
+    c.execute(f"INSERT OR IGNORE INTO sync_sites (site, seq) VALUES ({SITE}, 0)")
+    # Called again by migrations that add captured tables; their triggers go on then
+    tables = {r[0] for r in c.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for trigger in CAPTURED:
+        if trigger[2] in tables:
+            c.execute(_capture_trigger(*trigger))
+    if fresh:
+        _log_catalogue(c)
+
+
+def _log_catalogue(c):
+    # The catalogue as it stands when sync is switched on, so a first bundle carries it; stock
+    # history from before that point stays local. Archived placeholders (threshold -1) are skipped.
+    rows = [("items", name, {'category': cat, 'threshold': thr, 'location': loc})
+            for name, cat, thr, loc in c.execute("SELECT name, category, threshold, location FROM items WHERE threshold >= 0 AND name IS NOT NULL ORDER BY id")]
+    rows += [("kits", name, {'description': desc}) for name, desc in c.execute("SELECT name, description FROM kits WHERE name IS NOT NULL ORDER BY id")]
+    rows += [("kit_contents", k + KEY_SEP + i, {'qty': q}) for k, i, q in c.execute(
+        "SELECT k.name, i.name, SUM(kc.qty_needed) FROM kit_contents kc JOIN kits k ON k.id = kc.kit_id JOIN items i ON i.id = kc.item_id GROUP BY kc.kit_id, kc.item_id ORDER BY kc.kit_id, kc.item_id")]
+    site = local_site(c)
+    ts = int(time.time() * 1000)
+    c.executemany("INSERT INTO change_log (site, seq, tbl, op, key, data, ts) VALUES (?,?,?,'upsert',?,?,?)",
+                  [(site, seq, tbl, key, json.dumps(data), ts) for seq, (tbl, key, data) in enumerate(rows, 1)])
+    c.executemany("INSERT OR REPLACE INTO sync_versions (tbl, key, ts, site, seq) VALUES (?,?,?,?,?)",
+                  [(tbl, key, ts, site, seq) for seq, (tbl, key, _) in enumerate(rows, 1)])
+    c.execute("UPDATE sync_sites SET seq = ? WHERE site = ?", (len(rows), site))
+
+
+def local_site(c):
+    return c.execute("SELECT value FROM meta WHERE key = 'site_id'").fetchone()[0]
+
+
+@contextmanager
+def paused(conn):
+    # Writes made inside are not captured (bulk synthetic loads, applying a bundle); call inside a transaction
+    conn.execute("UPDATE meta SET value = 1 WHERE key = 'sync_applying'")
+    try:
+        yield conn
+    finally:
+        conn.execute("UPDATE meta SET value = 0 WHERE key = 'sync_applying'")
+
+
+def new_site(site_id=None):
+    # For a database file copied to start a new lab: it keeps the history it was cloned with but
+    # must not go on writing under the original's site id.
+    site_id = site_id or new_site_id()
+    with db.transaction() as c:
+        old = local_site(c)
+        if c.execute("SELECT 1 FROM sync_sites WHERE site = ?", (site_id,)).fetchone():
+            raise ValueError(f"Site id {site_id} is already known to this database")
+        c.execute("UPDATE meta SET value = ? WHERE key = 'site_id'", (site_id,))
+        c.execute("INSERT INTO sync_sites (site, seq) VALUES (?, 0)", (site_id,))
+    return old, site_id
+
+
+# --- EXPORT ---
+def export_bundle(path, peer=None):
+    # Writes every change the peer is not known to hold; with no peer, the whole log
+    with db.connection() as c:
+        site = local_site(c)
+        vector = dict(c.execute("SELECT site, seq FROM sync_sites"))
+        known = dict(c.execute("SELECT site, seq FROM sync_peers WHERE peer = ?", (peer,))) if peer else {}
+        changes = []
+        for origin, top in sorted(vector.items()):
+            if origin == peer or known.get(origin, 0) >= top:
+                continue
+            changes += c.execute("SELECT site, seq, tbl, op, key, data, ts, prev FROM change_log WHERE site = ? AND seq > ? ORDER BY seq",
+                                 (origin, known.get(origin, 0))).fetchall()
+    bundle = {'format': BUNDLE_FORMAT, 'site': site, 'peer': peer, 'created': int(time.time()), 'vector': vector,
+              'changes': [[s, q, t, op, k, json.loads(d) if d else None, ts, prev] for s, q, t, op, k, d, ts, prev in changes]}
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(bundle, f, separators=(",", ":"))
+    return {'site': site, 'peer': peer, 'changes': len(changes)}
+
+
+# --- IMPORT ---
+def read_bundle(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        bundle = json.load(f)
+    if bundle.get('format') != BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported bundle format {bundle.get('format')!r}")
+    return bundle
+
+
+def import_bundle(path):
+    bundle = read_bundle(path)
+    peer = bundle['site']
+    report = {'peer': peer, 'received': len(bundle['changes']), 'applied': 0, 'skipped': 0, 'conflicts': 0, 'gaps': []}
+    with db.transaction() as c:
+        if peer == local_site(c):
+            raise ValueError("Bundle was written by this site; run `python sync.py new-site` on a cloned database")
+        have = dict(c.execute("SELECT site, seq FROM sync_sites"))
+        # Each site's changes apply in sequence order, which keeps its causality; across sites the
+        # order does not matter, as registers converge on (ts, site) whatever it is.
+        pending = sorted((ch for ch in bundle['changes'] if ch[1] > have.get(ch[0], 0)), key=lambda ch: (ch[0], ch[1]))
+        report['skipped'] = report['received'] - len(pending)
+        firsts = {}
+        for ch in pending:
+            firsts[ch[0]] = min(firsts.get(ch[0], ch[1]), ch[1])
+        report['gaps'] = [origin for origin, first in firsts.items() if first > have.get(origin, 0) + 1]
+
+        with paused(c):
+            deferred = []
+            for ch in pending:
+                if not _apply(c, ch, report):
+                    deferred.append(ch)
+            # Kit lines whose kit or item came from a site applied after the line's own
+            for ch in deferred:
+                if not _apply(c, ch, report):
+                    _conflict(c, ch, None, 'local', "kit or item missing")
+                    report['conflicts'] += 1
+            c.executemany("INSERT INTO change_log (site, seq, tbl, op, key, data, ts, prev) VALUES (?,?,?,?,?,?,?,?)",
+                          [(s, q, t, op, k, None if d is None else json.dumps(d), ts, prev) for s, q, t, op, k, d, ts, prev in pending])
+
+        tops = {}
+        for ch in pending:
+            tops[ch[0]] = max(tops.get(ch[0], 0), ch[1])
+        c.executemany("INSERT INTO sync_sites (site, seq) VALUES (?, ?) ON CONFLICT (site) DO UPDATE SET seq = MAX(seq, excluded.seq)",
+                      list(tops.items()))
+        now = int(time.time())
+        c.executemany("""INSERT INTO sync_peers (peer, site, seq, synced_ts) VALUES (?,?,?,?)
+            ON CONFLICT (peer, site) DO UPDATE SET seq = MAX(seq, excluded.seq), synced_ts = excluded.synced_ts""",
+                      [(peer, origin, seq, now) for origin, seq in bundle['vector'].items()])
+    return report
+
+
+def _conflict(c, ch, local, winner, reason):
+    site, _, tbl, _, key, data, _, _ = ch
+    c.execute("INSERT INTO sync_conflicts (tbl, key, local, remote, remote_site, winner, reason, ts) VALUES (?,?,?,?,?,?,?,?)",
+              (tbl, key, None if local is None else json.dumps(local), None if data is None else json.dumps(data), site, winner, reason, int(time.time())))
+
+
+def _current(c, tbl, key):
+    if tbl == "items":
+        row = c.execute("SELECT category, threshold FROM items WHERE name = ?", (key,)).fetchone()
+        return row and {'category': row[0], 'threshold': row[1]}
+    if tbl == "kits":
+        row = c.execute("SELECT description FROM kits WHERE name = ?", (key,)).fetchone()
+        return row and {'description': row[0]}
+    target, column = LINES[tbl]
+    kit, name = key.split(KEY_SEP, 1)
+    row = c.execute(f"""SELECT SUM(l.qty_needed) FROM {tbl} l JOIN kits k ON k.id = l.kit_id JOIN {target} t ON t.id = l.{column}
+        WHERE k.name = ? AND t.name = ?""", (kit, name)).fetchone()
+    return {'qty': row[0]} if row[0] else None
+
+
+def _same(local, data):
+    if local is None or data is None:
+        return local is None and (data is None or data.get('qty') == 0)
+    return all(local.get(k) == data.get(k) for k in local)
+
+
+def _apply(c, ch, report):
+    # False means "retry later": a kit line whose kit, item or sub-kit is not here yet
+    site, seq, tbl, op, key, data, ts, prev = ch
+    if op == "move":
+        origin_id = int(key.rsplit(":", 1)[1])
+        c.execute("""INSERT OR IGNORE INTO remote_moves (site, origin_id, item, username, type, qty_change, ts, note, balance)
+            VALUES (?,?,?,?,?,?,?,?,?)""", (site, origin_id, data['item'], data['user'], data['type'], data['qty'], data['ts'], data['note'], data.get('balance')))
+        report['applied'] += 1
+        return True
+
+    if tbl in LINES:
+        target, column = LINES[tbl]
+        kit, name = key.split(KEY_SEP, 1)
+        kit_id = c.execute("SELECT id FROM kits WHERE name = ?", (kit,)).fetchone()
+        target_id = c.execute(f"SELECT id FROM {target} WHERE name = ?", (name,)).fetchone()
+        if not (kit_id and target_id):
+            return False
+
+    version = c.execute("SELECT ts, site, seq FROM sync_versions WHERE tbl = ? AND key = ?", (tbl, key)).fetchone()
+    if version is None:
+        wins = True
+    elif version[1] == site:
+        # Within one site seq decides, not the clock: a retried or stepped-back change never
+        # replaces a later one. Versions stamped before seq was kept fall back to ts.
+        wins = seq > version[2] if version[2] is not None else ts >= version[0]
+    else:
+        wins = (ts, site) > version[:2]
+    # Concurrent only if the remote writer had not seen the version held here
+    if version and version[1] != site and prev != f"{version[0]}@{version[1]}":
+        local = _current(c, tbl, key)
+        if not _same(local, data):
+            # Two sites wrote the same name differently; the later write wins everywhere
+            _conflict(c, ch, local, 'remote' if wins else 'local', "concurrent update" if op == "upsert" else "deleted remotely")
+            report['conflicts'] += 1
+    if not wins:
+        return True
+
+    try:
+        if tbl == "items" and op == "upsert":
+            # location and quantity are physical and stay per lab; a new item starts at 0 here
+            c.execute("""INSERT INTO items (name, category, quantity, threshold, location) VALUES (?,?,0,?,?)
+                ON CONFLICT (name) DO UPDATE SET category = excluded.category, threshold = excluded.threshold""",
+                      (key, data['category'], data['threshold'], data.get('location')))
+        elif tbl == "kits" and op == "upsert":
+            c.execute("INSERT INTO kits (name, description) VALUES (?,?) ON CONFLICT (name) DO UPDATE SET description = excluded.description",
+                      (key, data['description']))
+        elif tbl in ("items", "kits"):
+            c.execute(f"DELETE FROM {tbl} WHERE name = ?", (key,))
+        else:
+            if tbl == "kit_children" and data['qty'] and bom.would_cycle(c, kit_id[0], target_id[0]):
+                # Two labs nested two kits inside each other; each keeps its own and the clash is logged
+                _conflict(c, ch, _current(c, tbl, key), 'local', "would create a kit cycle")
+                report['conflicts'] += 1
+                return True
+            c.execute(f"DELETE FROM {tbl} WHERE kit_id = ? AND {column} = ?", (kit_id[0], target_id[0]))
+            if data['qty']:
+                c.execute(f"INSERT INTO {tbl} (kit_id, {column}, qty_needed) VALUES (?,?,?)", (kit_id[0], target_id[0], data['qty']))
+    except sqlite3.IntegrityError:
+        # e.g. a remote delete of an item this lab still holds stock history for
+        _conflict(c, ch, _current(c, tbl, key), 'local', "still referenced here")
+        report['conflicts'] += 1
+        return True
+    c.execute("""INSERT INTO sync_versions (tbl, key, ts, site, seq) VALUES (?,?,?,?,?)
+        ON CONFLICT (tbl, key) DO UPDATE SET ts = excluded.ts, site = excluded.site, seq = excluded.seq""", (tbl, key, ts, site, seq))
+    report['applied'] += 1
+    return True
+
+
+# --- STATUS ---
+def status():
+    with db.connection() as c:
+        return {
+            'site': local_site(c),
+            'vector': dict(c.execute("SELECT site, seq FROM sync_sites ORDER BY site")),
+            'peers': {peer: ts for peer, ts in c.execute("SELECT peer, MAX(synced_ts) FROM sync_peers GROUP BY peer ORDER BY peer")},
+            'conflicts': c.execute("SELECT count(*) FROM sync_conflicts").fetchone()[0],
+            'remote_moves': c.execute("SELECT count(*) FROM remote_moves").fetchone()[0],
+        }
+
+
+def conflicts(limit=50):
+    return db.read("SELECT id, tbl, key, local, remote, remote_site, winner, reason, ts FROM sync_conflicts ORDER BY id DESC LIMIT ?", (limit,))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Exchange change bundles between RoboLab databases in different labs.")
+    parser.add_argument("--db", default=db.DB_FILE)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("export", help="write the changes a peer has not seen to a bundle file")
+    p.add_argument("bundle")
+    p.add_argument("--peer", help="site id of the receiving lab (default: everything)")
+    p = sub.add_parser("import", help="apply a bundle written by another lab")
+    p.add_argument("bundle")
+    sub.add_parser("status", help="show this site, its version vector and known peers")
+    sub.add_parser("conflicts", help="list recent conflicts")
+    p = sub.add_parser("new-site", help="give a copied database its own site id")
+    p.add_argument("--site-id")
+    args = parser.parse_args()
+    db.DB_FILE = args.db
+
+    import migrations
+    migrations.migrate()
+    if args.command == "export":
+        print(export_bundle(args.bundle, args.peer))
+    elif args.command == "import":
+        print(import_bundle(args.bundle))
+    elif args.command == "status":
+        print(json.dumps(status(), indent=2))
+    elif args.command == "conflicts":
+        for row in conflicts():
+            print(row)
+    else:
+        print("site id {} -> {}".format(*new_site(args.site_id)))
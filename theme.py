@@ -0,0 +1,89 @@
+import streamlit as st
+
+# --- CUSTOM CSS ---
+CSS = """
+    <style>
+    /* 1. Main Background */
+    .stApp { 
+        background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%); 
+    }
+
+    /* 2. Sidebar */
+    section[data-testid="stSidebar"] {
+        background-color: #f8f9fa; 
+        border-right: 4px solid #630812; 
+    }
+    
+    section[data-testid="stSidebar"] .stMarkdown, 
+    section[data-testid="stSidebar"] h1, 
+    section[data-testid="stSidebar"] h2, 
+    section[data-testid="stSidebar"] h3, 
+    section[data-testid="stSidebar"] p {
+        color: #000000 !important;
+    }
+
+    /* 3. Metric Cards */
+    div[data-testid="metric-container"] { 
+        background-color: #ffffff; 
+        border-left: 6px solid #be1e2d; 
+        padding: 15px; 
+        border-radius: 10px; 
+        box-shadow: 0 4px 6px rgba(0,0,0,0.1); 
+    }
+
+    /* 4. Header Banner */
+    .lab-header { 
+        background-color: #ffffff; 
+        padding: 20px; 
+        border-radius: 15px; 
+        text-align: center; 
+        margin-bottom: 30px; 
+        border-bottom: 4px solid #be1e2d; 
+        box-shadow: 0 4px 15px rgba(0,0,0,0.1); 
+    }
+    .lab-title { 
+        color: #be1e2d; 
+        font-size: 32px; 
+        font-weight: 800; 
+        margin: 0; 
+    }
+    .lab-subtitle { 
+        color: #333; 
+        font-size: 18px; 
+        margin-top: 5px; 
+    }
+    
+    /* 5. Buttons - Maroon */
+    .stButton > button { 
+        background-color: #630812; 
+        color: white; 
+        border: none; 
+    }
+    .stButton > button:hover { 
+        background-color: #8a0b1a; 
+        color: white; 
+    }
+    
+    /* 6. Profile Image Styling */
+    .profile-img {
+        border-radius: 50%;
+        border: 3px solid #630812;
+        display: block;
+        margin-left: auto;
+        margin-right: auto;
+    }
+    </style>
+"""
+
+
+def inject_css():
+    st.markdown(CSS, unsafe_allow_html=True)
+
+
+def render_header():
+    st.markdown("""
+        <div class="lab-header">
+            <div class="lab-title">Robotics & AI Lab</div>
+            <div class="lab-subtitle">TSRS-SAR | 2025 | Inventory Management System</div>
+        </div>
+    """, unsafe_allow_html=True)
@@ -0,0 +1,34 @@
+import importlib
+
+# Menu label -> (module, icon). Page modules, and the heavy libraries they pull in
+# (pandas, numpy, openpyxl), are only imported the first time their page is opened.
+PAGES = {
+    "Dashboard": ("views.dashboard", "speedometer2"),
+    "Stock & Kits": ("views.stock", "box-seam"),
+    "Manage Inventory": ("views.manage", "database"),
+    "Kit Builder": ("views.kit_builder", "tools"),
+    "Reports": ("views.reports", "file-earmark-bar-graph"),
+    "User Mgmt": ("views.users", "people"),
+    "My Profile": ("views.profile", "person-circle"),
+    "Performance": ("views.performance", "activity"),
+    "Maintenance": ("views.maintenance", "hdd-stack"),
+}
+
+ADMIN_PAGES = list(PAGES)
+STAFF_PAGES = ["Dashboard", "Stock & Kits", "My Profile"]
+
+
+def pages_for(role):
+    return ADMIN_PAGES if role == 'admin' else STAFF_PAGES
+
+
+def render(page, profile=False):
+    # profile=True captures a cProfile report of this render into session state for the Performance page
+    import streamlit as st
+
+    import perf
+    with perf.profile(profile) as prof, perf.timed('page', page):
+        if profile:
+            # prof is filled in when the block exits, even if the page calls st.rerun()
+            st.session_state['perf_profile'] = (page, prof)
+        importlib.import_module(PAGES[page][0]).render()
@@ -0,0 +1,85 @@
+import os
+
+import streamlit as st
+
+import jobs
+import search
+
+
+def component_picker(label, key, allow_all=False):
+    # Server-side search: the selectbox only ever carries the top matches, never the whole catalogue
+    query = st.text_input(f"🔍 {label}", key=f"{key}_query", placeholder="Name, part no., category or location")
+    matches = {m[1]: m for m in search.search_items(query)}
+    names = (["All Items"] if allow_all else []) + list(matches.keys())
+    if not names:
+        st.caption("No matching components.")
+        return None
+    choice = st.selectbox(label, names, key=key, label_visibility="collapsed")
+    return matches.get(choice)
+
+
+# --- NOTIFICATIONS ---
+def flash(message, icon="✅"):
+    # Shown as a toast at the start of the next rerun, so an action can st.rerun() straight away
+    st.session_state.setdefault('flashes', []).append((message, icon))
+
+
+def job_message(job):
+    if job['status'] == 'failed':
+        return f"{job['label']} failed: {job['error']}"
+    result = job['result']
+    if job['kind'] == 'import':
+        return f"{job['label']} complete: {result['inserted']} added, {result['updated']} updated, {result['rejected']} rejected."
+    if job['kind'] == 'export':
+        return f"{job['label']} ready: {result['rows']} rows. Download it from Background Jobs."
+    if job['kind'] == 'maintenance':
+        return f"{job['label']} finished in {result['seconds']:.1f}s: {result['detail']}."
+    return f"{job['label']} finished."
+
+
+def show_notifications(user):
+    for message, icon in st.session_state.pop('flashes', []):
+        st.toast(message, icon=icon)
+    for job in jobs.take_finished(user):
+        st.toast(job_message(job), icon="✅" if job['status'] == 'done' else "❌")
+
+
+# --- JOB TRAY ---
+def _read_file(path):
+    def produce():
+        with open(path, 'rb') as f:
+            return f.read()
+    return produce
+
+
+def _render_tray(user):
+    recent = jobs.recent(user)
+    if not recent:
+        return
+    st.markdown("**Background Jobs**")
+    for job in recent:
+        if job['status'] in jobs.ACTIVE:
+            st.progress(job['progress'] or 0.0, text=f"{job['label']}: {job['message'] or job['status']}")
+        elif job['status'] == 'failed':
+            st.caption(f"❌ {job['label']}")
+        elif job['kind'] == 'export' and job['result'] and os.path.exists(job['result']['path']):
+            st.download_button(f"⬇️ {job['label']}", _read_file(job['result']['path']),
+                               f"{job['label'].lower().replace(' ', '_')}.{job['result']['format']}",
+                               mime=job['result']['mime'], key=f"job_{job['id']}", width='stretch')
+        else:
+            st.caption(f"✅ {job['label']}")
+
+
+@st.fragment(run_every="2s")
+def _live_tray(user):
+    # Only this fragment polls while jobs run; once they are all done a full rerun delivers the toasts
+    if not jobs.has_active(user):
+        st.rerun(scope="app")
+    _render_tray(user)
+
+
+def job_tray(user):
+    if jobs.has_active(user):
+        _live_tray(user)
+    else:
+        _render_tray(user)
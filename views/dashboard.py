@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import streamlit as st
+
+import dashboard
+import exporter
+import forecast
+
+
+# --- 1. DASHBOARD ---
+def render():
+    st.subheader("📊 Operational Overview")
+    version = dashboard.data_version()
+    metrics = dashboard.dashboard_metrics(version)
+    if metrics['items']:
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Total Components", metrics['items'], "Items")
+        c2.metric("Total Stock Volume", metrics['volume'], "Units")
+        c3.metric("Active Kit Types", metrics['kits'], "Activities")
+        st.markdown("---")
+        req_df = dashboard.purchase_requisition(version)
+        c_left, c_right = st.columns([2, 1])
+        with c_left:
+            st.markdown("##### 📦 Stock Distribution")
+            st.bar_chart(dashboard.category_distribution(version), color="#be1e2d")
+        with c_right:
+             # Only items at or below their threshold; forecast-driven reorders stay in the requisition below
+             st.markdown("##### ⚠️ Low Stock Alerts")
+             low_df = req_df[req_df['Current Qty'] <= req_df['Min Limit']]
+             if not low_df.empty:
+                 st.dataframe(low_df[['Item Name', 'Current Qty', 'Min Limit']], hide_index=True)
+             else:
+                 st.success("All stocks healthy.")
+        st.markdown("---")
+        st.subheader("📝 Purchase Requisition")
+        if not req_df.empty:
+            st.info(f"Items at or below their threshold, or their reorder point from the last {forecast.HISTORY_DAYS} days of usage "
+                    f"({forecast.LEAD_TIME_DAYS}-day lead time, {forecast.COVER_DAYS} days of cover):")
+            st.dataframe(req_df, width='stretch')
+            with st.expander("Threshold History"):
+                st.dataframe(dashboard.reorder_history(version), hide_index=True, width='stretch')
+            st.download_button(label="📥 Download Purchase Order", data=exporter.deferred(exporter.export_purchase_order, 'csv', st.session_state['username']), file_name=f"PO_{datetime.now().strftime('%Y-%m-%d')}.csv", mime="text/csv", type="primary")
+        else:
+            st.success("✅ No Purchase Orders needed.")
+    else:
+        st.info("System Initialized. Please add inventory.")
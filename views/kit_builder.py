@@ -0,0 +1,59 @@
+import pandas as pd
+import streamlit as st
+
+import bom
+import db
+from db import run_query
+from inventory import get_kit_details
+from views.common import component_picker, flash
+
+
+# --- 4. KIT BUILDER ---
+def render():
+    st.subheader("🧰 Kit Configuration")
+    c1, c2 = st.columns([1, 2])
+    with c1:
+        with st.form("create_kit"):
+            st.markdown("#### Create Kit Type")
+            new_kit = st.text_input("Kit Name")
+            desc = st.text_input("Description")
+            if st.form_submit_button("Create"):
+                if run_query("INSERT INTO kits (name, description) VALUES (?,?)", (new_kit, desc)):
+                    flash(f"Created {new_kit}.")
+                    st.rerun()
+    with c2:
+        st.markdown("#### Add Contents")
+        kits = run_query("SELECT id, name FROM kits")
+        if kits and db.read_one("SELECT 1 FROM items LIMIT 1"):
+            k_col, i_col, q_col = st.columns(3)
+            kit_map = {k[1]: k[0] for k in kits}
+            sel_kit = k_col.selectbox("Kit", list(kit_map.keys()))
+            with i_col:
+                picked = component_picker("Component", key='kit_item')
+            qty_needed = q_col.number_input("Qty", min_value=1, value=1)
+            if picked and st.button("Link Item"):
+                bom.link_item(kit_map[sel_kit], picked[0], qty_needed)
+                flash(f"Linked {picked[1]} to {sel_kit}.")
+                st.rerun()
+            others = [name for name in kit_map if name != sel_kit]
+            if others:
+                s_col, n_col, b_col = st.columns(3)
+                sub_kit = s_col.selectbox("Sub-kit", others)
+                sub_qty = n_col.number_input("Sub-kit Qty", min_value=1, value=1)
+                if b_col.button("Link Sub-kit"):
+                    try:
+                        bom.link_kit(kit_map[sel_kit], kit_map[sub_kit], sub_qty)
+                        flash(f"Added {sub_qty} x {sub_kit} to {sel_kit}.")
+                        st.rerun()
+                    except bom.KitCycle as e:
+                        st.error(f"{sub_kit} already contains {sel_kit}. {e}.")
+            st.divider()
+            st.caption(f"Contents of: {sel_kit}")
+            definition = bom.definition(kit_map[sel_kit])
+            if definition:
+                st.dataframe(pd.DataFrame(definition, columns=['Type', 'Component', 'Qty Needed']), hide_index=True, width='stretch')
+            contents = get_kit_details(kit_map[sel_kit])
+            if contents and any(row[0] == 'Sub-kit' for row in definition):
+                with st.expander("Flattened bill of materials"):
+                    st.dataframe(pd.DataFrame(contents, columns=['Component', 'Qty Needed', 'Stock', 'ID'])[['Component', 'Qty Needed', 'Stock']],
+                                 hide_index=True, width='stretch')
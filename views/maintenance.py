@@ -0,0 +1,60 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+import db
+import jobs
+import maintenance
+from views.common import flash
+
+
+def _mb(n):
+    return f"{(n or 0) / 1e6:,.1f} MB"
+
+
+# --- 9. MAINTENANCE ---
+def render():
+    st.subheader("🗄️ Maintenance")
+    st.caption(f"Snapshots go to `{maintenance.backup_dir()}`; the newest {maintenance.KEEP} are kept. "
+               f"The nightly run starts once the lab has been quiet for {maintenance.IDLE_S // 60} minutes.")
+
+    with db.connection() as conn:
+        free, page_size = maintenance.free_pages(conn)
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    last = maintenance.last_run('backup')
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Database", _mb(maintenance.db_bytes()))
+    c2.metric("Free Pages", f"{free:,}", _mb(free * page_size), delta_color="off")
+    c3.metric("Last Backup", datetime.fromtimestamp(last).strftime('%d %b %H:%M') if last else "Never")
+    c4.metric("Snapshots", len(maintenance.snapshots()))
+    if mode != 2:
+        st.info("Incremental compaction is off for this database file. Stop the app and run "
+                "`python maintenance.py compact --full` once to turn it on.")
+
+    user = st.session_state['username']
+    b1, b2, b3, b4 = st.columns(4)
+    actions = (
+        (b1, "Back up now", "Backup", maintenance.backup, {}),
+        (b2, "Compacted snapshot", "Compacted snapshot", maintenance.backup, {'compact': True}),
+        (b3, "Quick check", "Quick check", maintenance.quick_check, {}),
+        (b4, "Release free pages", "Compaction", maintenance.compact, {}),
+    )
+    for col, label, job_label, fn, kwargs in actions:
+        if col.button(label, use_container_width=True, disabled=jobs.has_active(user)):
+            jobs.submit('maintenance', job_label, user, fn, **kwargs)
+            flash(f"{job_label} started in the background.", icon="⏳")
+            st.rerun()
+
+    st.markdown("##### Recent Runs")
+    runs = maintenance.recent_runs()
+    if runs.empty:
+        st.info("No maintenance has run yet.")
+    else:
+        runs['DB Size'] = runs.pop('DB Bytes').map(_mb)
+        runs['Output'] = runs.pop('Out Bytes').map(lambda n: "" if pd.isna(n) else _mb(n))
+        runs['Path'] = runs['Path'].map(lambda p: os.path.basename(p) if p else "")
+        st.dataframe(runs[['Started', 'Kind', 'Status', 'Seconds', 'DB Size', 'Output', 'Path', 'Detail']], hide_index=True, width='stretch')
+    st.caption("Restoring replaces the live database, so it is only offered from the command line: "
+               "`python maintenance.py restore <snapshot>` with the app stopped.")
@@ -0,0 +1,58 @@
+import pandas as pd
+import streamlit as st
+
+import importer
+import inventory
+import jobs
+import loans
+from db import run_query
+from views.common import component_picker, flash
+
+
+# --- 3. MANAGE INVENTORY ---
+def render():
+    st.subheader("🗄️ Database Management")
+    with st.expander("📤 Bulk Import (Excel/CSV)", expanded=False):
+        st.info("Required Columns: `Name`, `Category`, `Quantity`, `Threshold`, `Location`")
+        if st.button("Download Template CSV"):
+            df_temp = pd.DataFrame(columns=["Name", "Category", "Quantity", "Threshold", "Location"])
+            st.download_button("Get Template", df_temp.to_csv(index=False).encode('utf-8'), "template.csv", "text/csv")
+        uploaded_file = st.file_uploader("Drop File Here", type=['xlsx', 'csv'])
+        if uploaded_file and st.button("Process Import"):
+            jobs.submit('import', f"Import {uploaded_file.name}", st.session_state['username'],
+                        importer.import_file, uploaded_file.getvalue(), uploaded_file.name, st.session_state['username'])
+            flash("Import started in the background.", icon="⏳")
+            st.rerun()
+        last = jobs.recent(st.session_state['username'], limit=1)
+        if last and last[0]['kind'] == 'import' and last[0]['status'] == 'done' and last[0]['result']['errors']:
+            st.warning(f"Rejected rows from {last[0]['label']} were skipped:")
+            st.dataframe(pd.DataFrame(last[0]['result']['errors']), hide_index=True, width='stretch')
+    with st.expander("➕ Add Single Item", expanded=False):
+        with st.form("new_item"):
+            c1, c2 = st.columns(2)
+            name = c1.text_input("Item Name")
+            cat = c2.selectbox("Category", ["Sensors", "Motors", "Microcontrollers", "Wires", "Tools", "Batteries", "Other"])
+            c3, c4, c5 = st.columns(3)
+            qty = c3.number_input("Qty", min_value=0)
+            thresh = c4.number_input("Threshold", value=5)
+            loc = c5.text_input("Location")
+            returnable = st.checkbox("Returnable equipment (lent out and checked back in, not consumed)")
+            if st.form_submit_button("Save"):
+                if inventory.add_item(name, cat, qty, thresh, loc, st.session_state['username'], returnable):
+                    flash(f"Added {name}.")
+                    st.rerun()
+                else:
+                    st.error("Item exists.")
+    with st.expander("🔁 Returnable Equipment", expanded=False):
+        picked = component_picker("Component", key='returnable_item')
+        if picked:
+            current = bool(run_query("SELECT returnable FROM items WHERE id = ?", (picked[0],))[0][0])
+            flag = st.toggle("Returnable", value=current, key=f"returnable_{picked[0]}")
+            if flag != current and loans.set_returnable(picked[0], flag):
+                flash(f"{picked[1]} is {'now' if flag else 'no longer'} returnable.")
+                st.rerun()
+    data = run_query("SELECT id, name, category, quantity, threshold, location, returnable FROM items")
+    if data:
+        df = pd.DataFrame(data, columns=['ID', 'Name', 'Category', 'Qty', 'Threshold', 'Location', 'Returnable'])
+        df['Returnable'] = df['Returnable'].astype(bool)
+        st.dataframe(df, width='stretch')
@@ -0,0 +1,82 @@
+import pandas as pd
+import streamlit as st
+
+import db
+import perf
+
+
+def _percentiles(df, by):
+    grouped = df.groupby(by)['ms']
+    out = pd.DataFrame({
+        'Calls': grouped.size(),
+        'p50 ms': grouped.quantile(0.5),
+        'p95 ms': grouped.quantile(0.95),
+        'Max ms': grouped.max(),
+        'Total ms': grouped.sum(),
+    })
+    return out.round(2)
+
+
+# --- 8. PERFORMANCE ---
+def render():
+    st.subheader("⏱️ Performance")
+    st.caption(f"Last {perf.RING_SIZE} timing events in this server process." + ("" if perf.ENABLED else " Recording is off (ROBOLAB_PERF=0)."))
+
+    b1, b2, b3 = st.columns(3)
+    if b1.button("Profile next page render"):
+        st.session_state['perf_profile_next'] = True
+        st.toast("The next page you open will be profiled.", icon="🔬")
+    if b2.button("Flush to metrics table"):
+        st.toast(f"Flushed {perf.flush()} events to perf_metrics.", icon="💾")
+    if b3.button("Clear buffer"):
+        perf.reset()
+
+    df = pd.DataFrame(perf.events(), columns=perf.EVENT_FIELDS)
+    if df.empty:
+        st.info("No timings recorded yet.")
+        return
+
+    reruns = df[df['kind'] == 'rerun']
+    txns = df[df['kind'] == 'txn']
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Events", len(df))
+    c2.metric("Rerun p50", f"{reruns['ms'].median():.1f} ms" if not reruns.empty else "–")
+    c3.metric("Rerun p95", f"{reruns['ms'].quantile(0.95):.1f} ms" if not reruns.empty else "–")
+    c4.metric("Lock wait p95", f"{txns['wait_ms'].quantile(0.95):.1f} ms" if not txns.empty else "–")
+
+    st.markdown("##### Pages and Fragments")
+    pages = df[df['kind'].isin(['page', 'fragment', 'rerun'])]
+    if not pages.empty:
+        st.dataframe(_percentiles(pages, ['kind', 'name']), width='stretch')
+
+    st.markdown("##### Slowest Queries")
+    queries = df[df['kind'] == 'query']
+    if not queries.empty:
+        table = _percentiles(queries, 'name')
+        table['Avg Rows'] = queries.groupby('name')['rows'].mean().round(1)
+        st.dataframe(table.sort_values('Max ms', ascending=False).head(25), width='stretch')
+
+    c_left, c_right = st.columns(2)
+    with c_left:
+        st.markdown("##### Transactions, Imports, Exports, DataFrames")
+        other = df[df['kind'].isin(['txn', 'import', 'export', 'frame'])]
+        if not other.empty:
+            table = _percentiles(other, ['kind', 'name'])
+            if not txns.empty:
+                table['Wait p95 ms'] = other.groupby(['kind', 'name'])['wait_ms'].quantile(0.95).round(2)
+            st.dataframe(table, width='stretch')
+    with c_right:
+        st.markdown("##### Cache Hit Rates")
+        stats = perf.cache_stats()
+        if stats:
+            hits = pd.DataFrame(stats, columns=['Function', 'Calls', 'Hits', 'Hit Rate'])
+            hits['Hit Rate'] = (hits['Hit Rate'] * 100).round(1).astype(str) + "%"
+            st.dataframe(hits, hide_index=True, width='stretch')
+
+    profiled = st.session_state.get('perf_profile')
+    if profiled and profiled[1].get('report'):
+        with st.expander(f"🔬 cProfile: {profiled[0]}"):
+            st.code(profiled[1]['report'], language=None)
+
+    stored = db.read_value("SELECT count(*) FROM perf_metrics", default=0)
+    st.caption(f"{stored} events stored in perf_metrics.")
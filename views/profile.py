@@ -0,0 +1,71 @@
+import streamlit as st
+
+import avatars
+from accounts import check_hashes, get_user_profile, make_hashes
+from db import run_query
+from views.common import flash
+
+
+# --- 7. MY PROFILE ---
+def render():
+    st.subheader("👤 My Profile Settings")
+
+    user_data = get_user_profile(st.session_state['username'])
+    # user_data: (username, role, employee_id, full_name, avatar_hash)
+
+    col1, col2 = st.columns([1, 2])
+
+    with col1:
+        st.markdown("#### Profile Picture")
+        avatar_uri = avatars.avatar_data_uri(user_data[4], 'profile') if user_data[4] else None
+        if avatar_uri:
+            st.markdown(f'<img src="{avatar_uri}" class="profile-img" width="150">', unsafe_allow_html=True)
+        else:
+            st.image("https://cdn-icons-png.flaticon.com/512/4712/4712035.png", width=150)
+        st.markdown("<br>", unsafe_allow_html=True)
+        uploaded_file = st.file_uploader("Change Avatar", type=['png', 'jpg', 'jpeg'])
+        if uploaded_file is not None:
+            if st.button("Save New Picture"):
+                try:
+                    st.session_state['avatar'] = avatars.set_user_avatar(st.session_state['username'], uploaded_file)
+                except ValueError as e:
+                    st.error(f"Avatar not saved: {e}.")
+                else:
+                    flash("Avatar updated!")
+                    st.rerun()
+
+    with col2:
+        st.markdown("#### Personal Details")
+
+        with st.form("update_details"):
+            # Locked Employee ID
+            st.text_input("Employee ID", value=user_data[2] if user_data[2] else "N/A", disabled=True)
+
+            # Editable Full Name
+            curr_name = user_data[3] if user_data[3] else ""
+            new_name = st.text_input("Full Name", value=curr_name)
+
+            if st.form_submit_button("Update Details"):
+                run_query("UPDATE users SET full_name = ? WHERE username = ?", (new_name, st.session_state['username']))
+                flash("Details saved successfully.")
+                st.rerun()
+
+        st.divider()
+
+        st.markdown("#### Security")
+        with st.expander("Change Password"):
+            with st.form("change_pass"):
+                old_pass = st.text_input("Current Password", type="password")
+                new_pass = st.text_input("New Password", type="password")
+                conf_pass = st.text_input("Confirm New Password", type="password")
+
+                if st.form_submit_button("Update Password"):
+                    current_hash = run_query("SELECT password FROM users WHERE username = ?", (st.session_state['username'],))[0][0]
+                    if check_hashes(old_pass, current_hash):
+                        if new_pass == conf_pass and new_pass != "":
+                            run_query("UPDATE users SET password = ? WHERE username = ?", (make_hashes(new_pass), st.session_state['username']))
+                            st.success("Password Changed Successfully!")
+                        else:
+                            st.error("New passwords do not match or are empty.")
+                    else:
+                        st.error("Incorrect Current Password.")
@@ -0,0 +1,105 @@
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+import dashboard
+import db
+import exporter
+import forecast
+import jobs
+import ledger
+import reports
+from db import run_query
+from views.common import component_picker, flash
+
+
+# --- 5. REPORTS ---
+def render():
+    st.subheader("📑 Audit & Usage Reports")
+    if db.read_one("SELECT 1 FROM stock_moves LIMIT 1"):
+        f1, f2, f3, f4 = st.columns(4)
+        report_period = f1.selectbox("Select Report Period", list(reports.PERIODS.keys()))
+        with f2:
+            picked = component_picker("Item", key='report_item', allow_all=True)
+        user_opts = [u[0] for u in run_query("SELECT username FROM users ORDER BY username")]
+        sel_user = f3.selectbox("User", ["All Users"] + user_opts)
+        sel_type = f4.selectbox("Type", ["All", "IN", "OUT"])
+        where, params = reports.build_filters(
+            report_period,
+            item_id=picked[0] if picked else None,
+            user=None if sel_user == "All Users" else sel_user,
+            txn_type=None if sel_type == "All" else sel_type,
+        )
+        totals = reports.summarize(where, params)
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Items Consumed (OUT)", totals['OUT'])
+        c2.metric("Items Restocked (IN)", totals['IN'])
+        c3.metric("Transactions", totals['rows'])
+        if totals['LENT'] or totals['RETURNED']:
+            st.caption(f"Equipment loans are not counted as consumption or restock: {totals['LENT']} units lent, "
+                       f"{totals['RETURNED']} returned.")
+
+        # Trends come from the daily rollups, so they ignore the user filter
+        start = reports.period_start(report_period)
+        trend = forecast.daily_trend(dashboard.data_version(), start.date().isoformat() if start else None, picked[0] if picked else None)
+        if not trend.empty:
+            if len(trend) > 180:
+                trend = trend.resample('W').sum()
+            st.line_chart(trend if sel_type == "All" else trend[[sel_type]])
+            if sel_user != "All Users":
+                st.caption("The trend covers all users.")
+
+        # Keyset pagination: a stack of (ts, id) cursors, reset whenever the filters change
+        filter_key = (where, tuple(str(p) for p in params))
+        if st.session_state.get('report_filter') != filter_key:
+            st.session_state['report_filter'] = filter_key
+            st.session_state['report_cursors'] = [None]
+        cursors = st.session_state['report_cursors']
+        page_size = 100
+        rows, next_cursor = reports.fetch_page(where, params, after=cursors[-1], limit=page_size)
+        df = pd.DataFrame(rows, columns=reports.REPORT_COLUMNS)
+        st.dataframe(df, width='stretch', hide_index=True)
+        p1, p2, p3 = st.columns([1, 2, 1])
+        if p1.button("◀ Newer", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+        p2.caption(f"Page {len(cursors)} of {max(1, -(-totals['rows'] // page_size))}")
+        if p3.button("Older ▶", disabled=len(rows) < page_size):
+            cursors.append(next_cursor)
+            st.rerun()
+
+        e1, e2 = st.columns([1, 3])
+        export_fmt = e1.radio("Export Format", ["csv", "xlsx"], horizontal=True)
+        if totals['rows'] >= jobs.BACKGROUND_EXPORT_ROWS:
+            # Large exports are written by the job pool; the file turns up under Background Jobs
+            if e2.button(f"Export {report_period} {export_fmt.upper()} in background ({totals['rows']} rows)"):
+                jobs.submit('export', f"Report {report_period}", st.session_state['username'], exporter.export_transactions,
+                            where, params, export_fmt, st.session_state['username'], report_period, total=totals['rows'])
+                flash("Export started in the background.", icon="⏳")
+                st.rerun()
+        else:
+            e2.download_button(
+                f"Download {report_period} {export_fmt.upper()}",
+                exporter.deferred(exporter.export_transactions, where, params, export_fmt, st.session_state['username'], report_period),
+                f"report_{report_period.lower()}.{export_fmt}",
+                mime=exporter.MIME_TYPES[export_fmt],
+            )
+
+        with st.expander("🧮 Stock Ledger"):
+            l1, l2 = st.columns(2)
+            with l1:
+                as_of = st.date_input("Stock on date", value=datetime.now().date())
+                # Expander bodies run even when collapsed, so the rebuild waits for the toggle
+                if st.toggle("Show stock levels", key='ledger_show'):
+                    st.dataframe(dashboard.stock_levels_on(dashboard.data_version(), as_of), hide_index=True, width='stretch')
+            with l2:
+                if st.button("Run Consistency Check"):
+                    mismatches = ledger.check_consistency()
+                    if mismatches.empty:
+                        st.success("Stock matches the ledger for every item.")
+                    else:
+                        st.error(f"{len(mismatches)} item(s) disagree with the ledger:")
+                        st.dataframe(mismatches, hide_index=True, width='stretch')
+    else:
+        st.info("No transaction history found.")
@@ -0,0 +1,312 @@
+from datetime import date
+
+import pandas as pd
+import streamlit as st
+
+import dashboard
+import db
+import inventory
+import jobs
+import loans
+import perf
+import planner
+import scanner
+from db import run_query
+from inventory import get_kit_details
+from views.common import component_picker, flash
+
+
+# --- 2. STOCK & KITS ---
+# Each tab is a fragment: its widgets rerun only that tab, with its own queries, and writes go
+# through on_click callbacks so the rerun that follows already shows the new stock. Callbacks
+# leave their message in session state; elements may not be drawn from a callback.
+def render():
+    st.subheader("📦 Inventory Counter")
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["🧩 Issue Activity Kit", "🔧 Single Item Transaction", "📷 Scan Batch",
+                                            "📐 Build Planner", "🔁 Loans"])
+    with tab1:
+        issue_kit_panel()
+    with tab2:
+        single_item_panel()
+    with tab3:
+        scan_batch_panel()
+    with tab4:
+        build_planner_panel()
+    with tab5:
+        loans_panel()
+
+
+def _loan_inputs(prefix, label):
+    # Borrower and due date, shown once the lend box is ticked; read back with _loan(prefix)
+    if st.checkbox(label, key=f'{prefix}_lend'):
+        c1, c2 = st.columns(2)
+        c1.text_input("Borrower", placeholder="Student, team or staff name", key=f'{prefix}_borrower')
+        c2.date_input("Due Back", value=loans.default_due(), key=f'{prefix}_due')
+
+
+def _loan(prefix):
+    if not st.session_state.get(f'{prefix}_lend'):
+        return None
+    borrower = (st.session_state.get(f'{prefix}_borrower') or "").strip()
+    if not borrower:
+        raise ValueError("Enter a borrower for the loan.")
+    return borrower, st.session_state.get(f'{prefix}_due', loans.default_due()).isoformat()
+
+
+def _issue_kit(kit_id, kit_name, kits):
+    try:
+        loan = _loan('kit')
+        inventory.issue_kit(kit_id, kit_name, st.session_state['username'], kits=kits, loan=loan)
+        st.session_state['issue_notice'] = f"Successfully issued {kits} x '{kit_name}'" + (f" on loan to {loan[0]}" if loan else "")
+    except inventory.InsufficientStock as e:
+        st.session_state['issue_error'] = f"Insufficient Stock: {e}"
+    except ValueError as e:
+        st.session_state['issue_error'] = str(e)
+
+
+@st.fragment
+@perf.traced('fragment', "Stock & Kits: Issue Kit")
+def issue_kit_panel():
+    kits = run_query("SELECT id, name FROM kits")
+    if kits:
+        c_sel, c_act = st.columns([3, 1])
+        kit_opts = {k[1]: k[0] for k in kits}
+        sel_kit_name = c_sel.selectbox("Select Activity Kit", list(kit_opts.keys()))
+        sel_kit_id = kit_opts[sel_kit_name]
+        contents = get_kit_details(sel_kit_id)
+        if contents:
+            num_kits = c_act.number_input("Number of Kits", min_value=1, value=1, key='num_kits')
+            df_kit = pd.DataFrame(contents, columns=['Component', 'Qty Per Kit', 'Current Stock', 'ID'])
+            df_kit['Required'] = df_kit.groupby('ID')['Qty Per Kit'].transform('sum') * num_kits
+            st.dataframe(df_kit[['Component', 'Qty Per Kit', 'Required', 'Current Stock']], width='stretch')
+            short = df_kit[df_kit['Required'] > df_kit['Current Stock']]
+            for name in short['Component'].unique():
+                st.toast(f"Low Stock: {name}", icon="❌")
+            if notice := st.session_state.pop('issue_notice', None):
+                st.toast(notice, icon="✅")
+            if error := st.session_state.pop('issue_error', None):
+                st.error(error)
+            _loan_inputs('kit', "Lend the returnable components")
+            if st.session_state.get('kit_lend'):
+                with db.connection() as conn:
+                    lent = loans.returnable_ids(conn, df_kit['ID'].unique().tolist())
+                names = sorted(df_kit.loc[df_kit['ID'].isin(lent), 'Component'].unique())
+                st.caption(f"On loan, to be checked back in: {', '.join(names)}" if names
+                           else "No component of this kit is marked returnable, so nothing will be lent.")
+            if short.empty:
+                if num_kits < jobs.BACKGROUND_KITS:
+                    c_act.button("ISSUE KIT", type="primary", on_click=_issue_kit, args=(sel_kit_id, sel_kit_name, num_kits))
+                elif c_act.button("ISSUE KIT", type="primary"):
+                    # Large issues go to the job pool; a full rerun starts the sidebar's job tray polling
+                    try:
+                        loan = _loan('kit')
+                    except ValueError as e:
+                        st.error(str(e))
+                    else:
+                        jobs.submit('issue', f"Issue {num_kits} x {sel_kit_name}", st.session_state['username'],
+                                    inventory.issue_kit, sel_kit_id, sel_kit_name, st.session_state['username'], kits=num_kits, loan=loan)
+                        flash(f"Issuing {num_kits} x '{sel_kit_name}' in the background.", icon="⏳")
+                        st.rerun()
+        else:
+            st.warning("Empty Kit.")
+    else:
+        st.info("No kits defined.")
+
+
+def _adjust(item_id, sign, lendable=False):
+    qty = st.session_state['in'] if sign > 0 else st.session_state['out']
+    try:
+        loan = _loan('txn') if sign < 0 and lendable else None
+        inventory.adjust_stock(item_id, sign * qty, st.session_state['username'], st.session_state.get('txn_note'), loan=loan)
+        if loan:
+            st.session_state['adjust_notice'] = f"Lent {qty} to {loan[0]}, due {loan[1]}."
+        else:
+            st.session_state['adjust_notice'] = f"Added {qty} to stock." if sign > 0 else f"Deducted {qty} from stock."
+    except inventory.InsufficientStock:
+        st.session_state['adjust_error'] = "Insufficient Stock"
+    except ValueError as e:
+        st.session_state['adjust_error'] = str(e)
+
+
+@st.fragment
+@perf.traced('fragment', "Stock & Kits: Single Item")
+def single_item_panel():
+    st.markdown("#### Manage Single Component")
+    picked = component_picker("Search Component", key='txn_item')
+    if picked:
+        curr_id, curr_qty = picked[0], picked[4]
+        returnable = bool(db.read_value("SELECT returnable FROM items WHERE id = ?", (curr_id,), default=0))
+        st.info(f"Current Stock: **{curr_qty}**" + (" · returnable equipment" if returnable else ""))
+        st.text_input("Transaction Note / Remark", placeholder="e.g., Student Project, Broken Part", key='txn_note')
+        if notice := st.session_state.pop('adjust_notice', None):
+            st.toast(notice, icon="✅")
+        if error := st.session_state.pop('adjust_error', None):
+            st.error(error)
+        c1, c2 = st.columns(2)
+        with c1:
+            st.number_input("Receive (+)", min_value=1, key='in')
+            st.button("Add to Stock", on_click=_adjust, args=(curr_id, 1))
+        with c2:
+            st.number_input("Consume (-)", min_value=1, key='out')
+            # The lend box stays ticked across picks, so it only counts for returnable items
+            if returnable:
+                _loan_inputs('txn', "Lend instead of consuming")
+            lending = returnable and st.session_state.get('txn_lend')
+            st.button("Lend" if lending else "Deduct from Stock", on_click=_adjust, args=(curr_id, -1, returnable))
+    elif not db.read_one("SELECT 1 FROM items LIMIT 1"):
+        st.warning("Inventory is empty.")
+
+
+def _scan(key):
+    # The input is cleared so the next scan starts empty
+    entries, errors = scanner.parse(st.session_state[key], st.session_state.get('scan_direction', "OUT"))
+    scanner.add_to_cart(st.session_state.setdefault('scan_cart', {}), entries)
+    if errors:
+        st.session_state['scan_errors'] = st.session_state.get('scan_errors', []) + [f"{line}: {reason}" for _, line, reason in errors]
+    st.session_state[key] = ""
+
+
+def _commit_cart():
+    cart = st.session_state.get('scan_cart', {})
+    try:
+        moved = scanner.commit_cart(cart, st.session_state['username'], st.session_state.get('scan_note') or None)
+        st.session_state['scan_cart'] = {}
+        st.session_state['scan_notice'] = f"Committed {moved} items in one batch."
+    except inventory.InsufficientStock as e:
+        st.session_state['scan_errors'] = [f"Insufficient stock, nothing committed: {e}"]
+
+
+def _clear_cart():
+    st.session_state['scan_cart'] = {}
+    st.session_state.pop('scan_errors', None)
+
+
+@st.fragment
+@perf.traced('fragment', "Stock & Kits: Scan Batch")
+def scan_batch_panel():
+    # Each scan only updates the cart in session state; the database is written once, on commit
+    st.markdown("#### Scan Batch")
+    st.caption("Scan or type an item name or #id, optionally followed by a quantity (\"#42 3\", \"HC-SR04, -2\"). "
+               "A signed quantity overrides the direction.")
+    c_dir, c_note = st.columns([1, 2])
+    c_dir.radio("Direction", ["OUT", "IN"], horizontal=True, key='scan_direction',
+                format_func=lambda d: "Check out (-)" if d == "OUT" else "Check in (+)")
+    c_note.text_input("Batch Note", placeholder="e.g., Session 3 returns", key='scan_note')
+    st.text_input("Scan", key='scan_code', placeholder="Focus here and scan; Enter adds to the cart",
+                  on_change=_scan, args=('scan_code',))
+    with st.expander("Paste a list"):
+        st.text_area("One item per line", key='scan_paste', height=150)
+        st.button("Add to Cart", on_click=_scan, args=('scan_paste',))
+
+    if notice := st.session_state.pop('scan_notice', None):
+        st.toast(notice, icon="✅")
+    for error in st.session_state.pop('scan_errors', []):
+        st.warning(error)
+
+    cart = st.session_state.get('scan_cart', {})
+    if not cart:
+        st.info("Cart is empty.")
+        return
+    stock = dict(db.read(f"SELECT id, quantity FROM items WHERE id IN ({','.join('?' * len(cart))})", list(cart)))
+    df = pd.DataFrame([(name, qty, stock.get(item_id, 0)) for item_id, (name, qty) in cart.items()],
+                      columns=['Component', 'Change', 'Current Stock'])
+    df['After'] = df['Current Stock'] + df['Change']
+    st.dataframe(df, hide_index=True, width='stretch')
+    short = df[df['After'] < 0]
+    if not short.empty:
+        st.error(f"Not enough stock for: {', '.join(short['Component'])}")
+    c1, c2 = st.columns(2)
+    c1.button(f"Commit {len(cart)} Items", type="primary", disabled=not short.empty, on_click=_commit_cart)
+    c2.button("Clear Cart", on_click=_clear_cart)
+
+
+@st.fragment
+@perf.traced('fragment', "Stock & Kits: Build Planner")
+def build_planner_panel():
+    st.markdown("#### Workshop Build Planner")
+    version = dashboard.data_version()
+    kit_names = planner.load_matrix(version)[1]
+    if kit_names:
+        st.caption("Enter how many of each kit you need; stock shared between kits is allocated across the whole mix.")
+        wanted = st.data_editor(
+            pd.DataFrame({'Kit': kit_names, 'Requested': 0}),
+            disabled=['Kit'], hide_index=True, width='stretch', key='plan_request',
+        )
+        summary, short = planner.plan(version, dict(zip(wanted['Kit'], wanted['Requested'].fillna(0))))
+        st.dataframe(summary, hide_index=True, width='stretch')
+        if not short.empty:
+            st.warning("Bottleneck components for the requested mix:")
+            st.dataframe(short, hide_index=True, width='stretch')
+        elif summary['Requested'].sum():
+            st.success("The full requested mix can be built from current stock.")
+    else:
+        st.info("No kits defined.")
+
+
+def _check_in(loan_id, item_ids):
+    # The inputs are cleared so they start from 0 against the new outstanding quantities
+    returns = {item_id: st.session_state.pop(f'ret_{loan_id}_{item_id}', 0) for item_id in item_ids}
+    try:
+        left = loans.check_in(loan_id, returns, st.session_state['username'])
+        st.session_state['loan_notice'] = f"Loan #{loan_id} closed." if not left else f"Checked in; {left} still out on loan #{loan_id}."
+    except loans.NotOnLoan as e:
+        st.session_state['loan_error'] = str(e)
+
+
+def _return_all(loan_id):
+    try:
+        loans.return_all(loan_id, st.session_state['username'])
+        st.session_state['loan_notice'] = f"Loan #{loan_id} closed."
+    except loans.NotOnLoan as e:
+        st.session_state['loan_error'] = str(e)
+
+
+def _reschedule(loan_id):
+    due = st.session_state[f'due_{loan_id}']
+    if loans.reschedule(loan_id, due):
+        st.session_state['loan_notice'] = f"Loan #{loan_id} is now due {due.isoformat()}."
+    else:
+        st.session_state['loan_error'] = f"Could not change the due date of loan #{loan_id}."
+
+
+@st.fragment
+@perf.traced('fragment', "Stock & Kits: Loans")
+def loans_panel():
+    # Everything here reads open_loans, which only holds what is still out
+    st.markdown("#### Equipment on Loan")
+    if notice := st.session_state.pop('loan_notice', None):
+        st.toast(notice, icon="✅")
+    if error := st.session_state.pop('loan_error', None):
+        st.error(error)
+    stats = loans.summary()
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Open Loans", stats['open'])
+    c2.metric("Overdue", stats['overdue'])
+    c3.metric("Units Out", stats['units'])
+    if not stats['open']:
+        st.info("Nothing is out on loan.")
+        return
+    if stats['overdue']:
+        st.markdown("##### ⏰ Overdue")
+        st.dataframe(loans.overdue(), hide_index=True, width='stretch')
+
+    st.markdown("##### Currently Out")
+    borrower = st.selectbox("Borrower", ["All Borrowers"] + loans.borrowers(), key='loan_borrower')
+    out = loans.currently_out(None if borrower == "All Borrowers" else borrower)
+    st.dataframe(out, hide_index=True, width='stretch')
+
+    st.markdown("##### Check In")
+    labels = {f"#{r.Loan} {r.Borrower} (due {r.Due})": r.Loan for r in out.itertuples()}
+    loan_id = labels[st.selectbox("Loan", list(labels), key='loan_pick')]
+    lines = loans.outstanding(loan_id)
+    for item_id, name, qty in lines:
+        st.number_input(f"{name} ({qty} out)", min_value=0, max_value=qty, value=0, key=f'ret_{loan_id}_{item_id}')
+    c1, c2 = st.columns(2)
+    c1.button("Check In", type="primary", on_click=_check_in, args=(loan_id, [line[0] for line in lines]))
+    c2.button("Return Everything", on_click=_return_all, args=(loan_id,))
+
+    st.markdown("##### Extend")
+    due = out.loc[out['Loan'] == loan_id, 'Due'].iloc[0]
+    c1, c2 = st.columns(2)
+    c1.date_input("New Due Date", value=max(date.fromisoformat(due), date.today()), key=f'due_{loan_id}')
+    c2.button("Change Due Date", on_click=_reschedule, args=(loan_id,))
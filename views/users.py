@@ -0,0 +1,36 @@
+import pandas as pd
+import streamlit as st
+
+from accounts import make_hashes
+from db import run_query
+from views.common import flash
+
+
+# --- 6. USER MGMT ---
+def render():
+    st.subheader("👥 User Administration")
+    with st.form("add_user"):
+        st.markdown("##### Create New User")
+        c1, c2 = st.columns(2)
+        u = c1.text_input("Username")
+        p = c2.text_input("Password", type="password")
+
+        c3, c4, c5 = st.columns(3)
+        r = c3.selectbox("Role", ["lab_assistant", "admin"])
+        emp_id = c4.text_input("Employee ID (Unique)")
+        fname = c5.text_input("Full Name")
+
+        if st.form_submit_button("Register User"):
+            if u and p and emp_id:
+                if run_query("INSERT INTO users (username, password, role, employee_id, full_name) VALUES (?,?,?,?,?)", (u, make_hashes(p), r, emp_id, fname)):
+                    flash(f"User {u} ({fname}) created successfully!")
+                    st.rerun()
+                else:
+                    st.error("Username already exists or database error.")
+            else:
+                st.warning("Please fill all fields.")
+
+    st.markdown("##### Existing Users")
+    users = run_query("SELECT username, role, employee_id, full_name FROM users")
+    if users:
+        st.dataframe(pd.DataFrame(users, columns=['Username', 'Role', 'Emp ID', 'Full Name']), width='stretch')